@@ -0,0 +1,99 @@
+""" Measures startup time of every entry point in a fresh interpreter.
+
+An entry point is started when its window is shown and the game is
+reset, or when the trainer built its state. The event loops and the
+training loop aren't run. The trainer starts with a new model and
+replay memory in a temporary directory on every run, so it doesn't
+touch or reuse the repository's training state. Run from the
+repository root:
+
+    python benchmarks/startup.py [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# Code that starts every entry point, prints whether TensorFlow was loaded
+GUI_CODE = '''
+import os, sys
+from PyQt5.QtWidgets import QApplication
+from environment import Tetris
+app = QApplication(sys.argv)
+window = Tetris({arguments})
+window.reset()
+window.show()
+app.processEvents()
+print('tensorflow' in sys.modules, flush=True)
+os._exit(0)  # Doesn't wait for the model thread
+'''
+
+TRAIN_CODE = '''
+import os, runpy, sys
+directory = sys.argv[1]
+sys.argv = ['train.py', '--epochs', '0',
+            '--model', os.path.join(directory, 'model.keras'),
+            '--memory', os.path.join(directory, 'model_memory_store')]
+runpy.run_path('train.py', run_name='__main__')
+print('tensorflow' in sys.modules, flush=True)
+'''
+
+ENTRY_POINTS = {
+    'environment.py': GUI_CODE.format(arguments=''),
+    'train.py': TRAIN_CODE,
+    'train_gui.py': GUI_CODE.format(arguments='train_ai=True'),
+    'test_gui.py': GUI_CODE.format(arguments='player_ai=True'),
+}
+
+
+def measure(code: str, root: str) -> tuple:
+    """ Runs code in a new interpreter, with a new temporary directory
+    as its first argument.
+
+    Args:
+        code (str): Code that starts an entry point.
+        root (str): Repository root, the working directory.
+
+    Returns:
+        tuple: Startup time in seconds and whether TensorFlow was loaded.
+    """
+
+    environment = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    with tempfile.TemporaryDirectory() as directory:
+        start_time = time.perf_counter()
+        process = subprocess.run([sys.executable, '-c', code, directory], cwd=root,
+                                 env=environment, capture_output=True, text=True)
+        elapsed_time = time.perf_counter() - start_time
+
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+
+    return elapsed_time, process.stdout.strip().splitlines()[-1] == 'True'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures startup time of the entry points.')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of every entry point')
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f'{"entry point":<16}{"median ms":>10}{"min ms":>10}  tensorflow')
+    for name, code in ENTRY_POINTS.items():
+        try:
+            results = [measure(code, root) for _ in range(args.repeat)]
+        except RuntimeError as error:
+            print(f'{name:<16}failed: {error}')
+            continue
+
+        times = [elapsed_time * 1000 for elapsed_time, _ in results]
+        tensorflow = 'loaded' if results[-1][1] else 'not loaded'
+        print(f'{name:<16}{statistics.median(times):>10.0f}{min(times):>10.0f}  {tensorflow}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,492 @@
+""" Benchmarks of the hot paths, compared with a stored baseline.
+
+Every benchmark runs on fixed seeds and reports its best time of a few
+repeats. Benchmarks that need TensorFlow or PyQt5 are skipped when they
+aren't installed. Run from the repository root:
+
+    python -m benchmarks.suite [--output results.json]
+    python -m benchmarks.suite --save-baseline --runs 3
+
+A result that is worse than the baseline by more than the tolerance is
+a regression, and the suite exits with status 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from main.bitboard import BitBoard
+from main.game_manager import GameManager
+from model.dqn import DQN
+from model.frame_stack import FrameStack
+from model.numpy_model import NumpyModel
+
+
+BASELINE_FILE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+TOLERANCE = 0.2  # Allowed slowdown, relative to the baseline
+REPLAY_TOLERANCE = 0.5  # Replay memory timings vary more between runs
+REPEAT = 15
+SEED = 0
+
+INPUT_SHAPE = (20, 10, 4)
+BATCH_SIZE = 16
+BATCHES_NUMBER = 200  # Batches sampled per repeat
+MEMORY_FILLS = (1_000, 10_000, 100_000)
+
+
+def _measure(function, repeat: int = REPEAT, setup=None) -> float:
+    """ Gets the best time of a function in seconds, after an untimed
+    warm-up call. The setup runs untimed before every call, so every
+    repeat does the same work.
+    """
+
+    if setup is not None:
+        setup()
+    function()
+
+    best_time = float('inf')
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+
+        start_time = time.perf_counter()
+        function()
+        best_time = min(best_time, time.perf_counter() - start_time)
+
+    return best_time
+
+
+def _rate(count: int, seconds: float) -> dict:
+    return {'value': count / seconds, 'unit': 'ops/s', 'higher_is_better': True}
+
+
+def _latency(seconds: float, count: int = 1, tolerance: float = None) -> dict:
+    result = {'value': seconds / count * 1000, 'unit': 'ms', 'higher_is_better': False}
+    if tolerance is not None:
+        result['tolerance'] = tolerance  # Overrides a lower tolerance
+
+    return result
+
+
+def _seed():
+    random.seed(SEED)
+    np.random.seed(SEED)
+
+
+def _play(env: GameManager, steps: int):
+    actions = np.random.default_rng(SEED).integers(0, 4, size=steps)
+    env.reset(SEED)
+    for action in actions:
+        _, _, game_over = env.step(int(action))
+        if game_over:
+            env.reset()
+
+
+def _fill_memory(dqn: DQN, transitions: int):
+    env = GameManager(seed=SEED)
+    actions = np.random.default_rng(SEED).integers(0, 4, size=transitions)
+    dqn.start_game(env.board)
+    for action in actions:
+        frame, reward, game_over = env.step(int(action))
+        dqn.add(action, reward, frame, game_over)
+        if game_over:
+            env.reset()
+            dqn.start_game(env.board)
+
+
+def _create_transitions(transitions: int) -> list:
+    """ Plays a game with random actions and keeps its transitions the
+    way the training remembers them, from a copied current state to the
+    next state.
+    """
+
+    env = GameManager(seed=SEED)
+    frame_stack = FrameStack(*INPUT_SHAPE)
+    frame_stack.reset(env.board)
+    actions = np.random.default_rng(SEED).integers(0, 4, size=transitions)
+
+    steps = []
+    for action in actions:
+        current_state = frame_stack.get_state().copy()
+        frame, reward, game_over = env.step(int(action))
+        frame_stack.push(frame)
+        steps.append(([current_state, action, reward, frame_stack.get_state().copy()],
+                      game_over))
+        if game_over:
+            env.reset()
+            frame_stack.reset(env.board)
+
+    return steps
+
+
+def _create_numpy_model(directory: str) -> NumpyModel:
+    """ Creates a NumPy model of `Brain.create_model` layers with random
+    weights, so the DQN benchmarks don't need TensorFlow.
+    """
+
+    rng = np.random.default_rng(SEED)
+    layers = [
+        {'type': 'Rescaling', 'activation': 'linear', 'pool_size': None,
+         'padding': 'valid', 'strides': None, 'scale': 1.0, 'offset': 0.0},
+        {'type': 'Conv2D', 'activation': 'relu', 'pool_size': None,
+         'padding': 'valid', 'strides': [1, 1]},
+        {'type': 'MaxPooling2D', 'activation': 'linear', 'pool_size': [2, 2],
+         'padding': 'valid', 'strides': [2, 2]},
+        {'type': 'Conv2D', 'activation': 'relu', 'pool_size': None,
+         'padding': 'valid', 'strides': [1, 1]},
+        {'type': 'Flatten', 'activation': 'linear', 'pool_size': None,
+         'padding': 'valid', 'strides': None},
+        {'type': 'Dense', 'activation': 'relu', 'pool_size': None,
+         'padding': 'valid', 'strides': None},
+        {'type': 'Dense', 'activation': 'linear', 'pool_size': None,
+         'padding': 'valid', 'strides': None},
+    ]
+    shapes = {1: ((3, 3, 4, 32), (32,)), 3: ((2, 2, 32, 64), (64,)),
+              5: ((1536, 256), (256,)), 6: ((256, 4), (4,))}
+    arrays = {f'layer_{index}_{weight_index}': rng.normal(0, 0.05, shape).astype(np.float32)
+              for index, weight_shapes in shapes.items()
+              for weight_index, shape in enumerate(weight_shapes)}
+
+    file_path = os.path.join(directory, 'model.npz')
+    with open(file_path, 'wb') as file:
+        np.savez(file, layers=json.dumps(layers), **arrays)
+
+    return NumpyModel(file_path)
+
+
+def _create_stack(bitboard: BitBoard, bits: int) -> tuple:
+    """ Locks 4 bottom rows of given cells and gets the board's state. """
+
+    bitboard.reset()
+    bitboard.lock(tuple((row_offset, bits) for row_offset in range(4)),
+                  bitboard.height - 4, 0)
+
+    return (bitboard.rows.copy(), bitboard.row_counts.copy(),
+            bitboard.heights.copy(), bitboard.filled_cells)
+
+
+def benchmark_engine(directory: str) -> dict:
+    """ Game steps and locking pieces with and without line clearing. """
+
+    steps = 20_000
+    env = GameManager(seed=SEED)
+    step_time = _measure(lambda: _play(env, steps))
+
+    # A vertical I piece locked in the first column of a stack, which
+    # fills all its 4 rows when only the first column is empty
+    bitboard = BitBoard()
+    piece = tuple((row_offset, 1) for row_offset in range(4))
+    full_stack = _create_stack(bitboard, bitboard.full_row & ~1)
+    stack = _create_stack(bitboard, bitboard.full_row >> 1 & ~1)
+
+    def lock(state: tuple):
+        rows, row_counts, heights, filled_cells = state
+        for _ in range(steps):
+            bitboard.rows = rows.copy()
+            bitboard.row_counts = row_counts.copy()
+            bitboard.heights = heights.copy()
+            bitboard.filled_cells = filled_cells
+            bitboard.lock(piece, bitboard.height - 4, 0)
+
+    return {
+        'engine.step': _rate(steps, step_time),
+        'engine.lock': _rate(steps, _measure(lambda: lock(stack))),
+        'engine.lock_clear_lines': _rate(steps, _measure(lambda: lock(full_stack))),
+    }
+
+
+def benchmark_replay(directory: str) -> dict:
+    """ Remembering experiences and sampling batches at different
+    memory fills, with the NumPy model as the trained and target model.
+    Every repeat samples the same batches and starts with an empty cache
+    of target Q-values, so the repeats don't depend on each other.
+    Remembered transitions are states of a played game, same as in the
+    training.
+    """
+
+    model = _create_numpy_model(directory)
+    transitions = _create_transitions(10_000)
+    results = {}
+    for fill in MEMORY_FILLS:
+        _seed()
+        dqn = DQN(fill, 0.9, INPUT_SHAPE[2])
+        dqn.set_target_model(model, BATCHES_NUMBER + 1)  # Never synchronized
+        _fill_memory(dqn, fill)
+
+        # Remembering runs on its own memory of the same fill, so it
+        # doesn't overwrite the sampled experiences
+        remember_dqn = DQN(fill, 0.9, INPUT_SHAPE[2])
+        _fill_memory(remember_dqn, fill)
+
+        def remember():
+            for transition, game_over in transitions:
+                remember_dqn.remember(transition, game_over)
+
+        def reset_batches():
+            _seed()
+            dqn.target_q_values[:] = np.nan
+            dqn.updates = 0
+
+        def get_batch():
+            for _ in range(BATCHES_NUMBER):
+                dqn.get_batch(model, BATCH_SIZE)
+
+        results[f'dqn.get_batch.{fill}'] = _latency(
+            _measure(get_batch, setup=reset_batches), BATCHES_NUMBER, REPLAY_TOLERANCE)
+        results[f'dqn.remember.{fill}'] = _latency(
+            _measure(remember), len(transitions), REPLAY_TOLERANCE)
+
+    return results
+
+
+def benchmark_numpy_model(directory: str) -> dict:
+    """ Forward pass of the NumPy model, used for playing. """
+
+    model = _create_numpy_model(directory)
+    state = np.random.default_rng(SEED).integers(0, 2, (1, *INPUT_SHAPE), dtype=np.uint8)
+    batch = np.repeat(state, BATCH_SIZE, axis=0)
+
+    return {
+        'numpy_model.predict.1': _latency(_measure(lambda: model.predict(state)), 1),
+        f'numpy_model.predict.{BATCH_SIZE}': _latency(_measure(lambda: model.predict(batch)), 1),
+    }
+
+
+def benchmark_brain(directory: str) -> dict:
+    """ Keras predict and train step of the model. """
+
+    from model.brain import Brain
+
+    _seed()
+    model = Brain(INPUT_SHAPE).create_model()
+    rng = np.random.default_rng(SEED)
+    state = rng.integers(0, 2, (1, *INPUT_SHAPE), dtype=np.uint8)
+    inputs = rng.integers(0, 2, (BATCH_SIZE, *INPUT_SHAPE), dtype=np.uint8)
+    targets = rng.normal(size=(BATCH_SIZE, 4)).astype(np.float32)
+
+    # First calls build the graphs
+    model.predict(state, verbose=0)
+    model.train_on_batch(inputs, targets)
+
+    return {
+        'brain.predict': _latency(_measure(lambda: model.predict(state, verbose=0))),
+        'brain.train_on_batch': _latency(_measure(lambda: model.train_on_batch(inputs, targets))),
+    }
+
+
+def benchmark_checkpoint(directory: str) -> dict:
+    """ Saving and opening the replay memory files and saving and
+    loading the model.
+    """
+
+    memory_path = os.path.join(directory, 'memory')
+    fill = MEMORY_FILLS[-1]
+
+    _seed()
+    dqn = DQN(fill, 0.9, INPUT_SHAPE[2], memory_path)
+    _fill_memory(dqn, fill)
+
+    results = {
+        'checkpoint.memory_flush': _latency(_measure(dqn.memory.flush),
+                                            tolerance=REPLAY_TOLERANCE),
+        'checkpoint.memory_open': _latency(_measure(
+            lambda: DQN(fill, 0.9, INPUT_SHAPE[2], memory_path)), tolerance=REPLAY_TOLERANCE),
+    }
+
+    try:
+        from model.brain import Brain
+    except ImportError:
+        return results
+
+    brain = Brain(INPUT_SHAPE)
+    model = brain.create_model()
+    model_path = os.path.join(directory, 'model.keras')
+    results['checkpoint.model_save'] = _latency(_measure(lambda: model.save(model_path)))
+    results['checkpoint.model_load'] = _latency(_measure(lambda: brain.load_model(model_path)))
+
+    return results
+
+
+def benchmark_gui(directory: str) -> dict:
+    """ Drawing boards of a game in the board widget. """
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from environment import BoardWidget
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    widget = BoardWidget()
+    widget.resize(300, 550)
+    widget.show()
+
+    steps = 1000
+    env = GameManager(seed=SEED)
+    actions = np.random.default_rng(SEED).integers(0, 4, size=steps)
+
+    def draw():
+        env.reset(SEED)
+        for action in actions:
+            board, _, game_over = env.step(int(action))
+            widget.set_board(board)
+            widget.repaint()
+            if game_over:
+                env.reset()
+
+    app.processEvents()
+    draw_time = _measure(draw, repeat=3)
+    widget.close()
+
+    return {'gui.redraw': _latency(draw_time, steps)}
+
+
+BENCHMARKS = (
+    benchmark_engine,
+    benchmark_replay,
+    benchmark_numpy_model,
+    benchmark_brain,
+    benchmark_checkpoint,
+    benchmark_gui,
+)
+
+
+def run_benchmarks(names: list = None) -> dict:
+    """ Runs the benchmarks.
+
+    Args:
+        names (list, optional): Names of benchmark functions to run,
+            without the `benchmark_` prefix. All of them by default.
+
+    Returns:
+        dict: Results by their names, and the skipped benchmarks.
+    """
+
+    results = {}
+    skipped = {}
+    directory = tempfile.mkdtemp()
+    try:
+        for benchmark in BENCHMARKS:
+            name = benchmark.__name__.removeprefix('benchmark_')
+            if names and name not in names:
+                continue
+
+            try:
+                results.update(benchmark(directory))
+            except ImportError as error:
+                skipped[name] = str(error)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+        'skipped': skipped,
+    }
+
+
+def merge_runs(runs: list) -> dict:
+    """ Takes the median value of every result of several suite runs.
+
+    Args:
+        runs (list): Results of `run_benchmarks`.
+
+    Returns:
+        dict: Results of the first run with the median values.
+    """
+
+    merged = runs[0]
+    for name, result in merged['results'].items():
+        result['value'] = float(np.median(
+            [run['results'][name]['value'] for run in runs]))
+
+    return merged
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> list:
+    """ Compares results with a baseline.
+
+    Args:
+        results (dict): Results of `run_benchmarks`.
+        baseline (dict): Results of an earlier run.
+        tolerance (float): Allowed slowdown, relative to the baseline.
+            Results with a higher tolerance of their own use it.
+
+    Returns:
+        list: Names of the results that regressed, with their change.
+    """
+
+    regressions = []
+    for name, result in results['results'].items():
+        baseline_result = baseline['results'].get(name)
+        if not baseline_result:
+            continue
+
+        # Change of speed, negative when it's slower
+        if result['higher_is_better']:
+            change = result['value'] / baseline_result['value'] - 1
+        else:
+            change = baseline_result['value'] / result['value'] - 1
+
+        status = 'ok'
+        if change < -max(tolerance, result.get('tolerance', 0)):
+            status = 'REGRESSION'
+            regressions.append((name, change))
+
+        print(f'{name:<32}{result["value"]:>14.6g} {result["unit"]:<6}'
+              f'{change:>+8.1%}  {status}')
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the benchmarks.')
+    parser.add_argument('--output', help='results file path')
+    parser.add_argument('--baseline', default=BASELINE_FILE_PATH, help='baseline file path')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='saves the results as the baseline')
+    parser.add_argument('--runs', type=int, default=1,
+                        help='runs the suite several times and takes the median results')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help=f'allowed slowdown, {TOLERANCE} by default')
+    parser.add_argument('benchmarks', nargs='*', help='benchmarks to run, all by default')
+    args = parser.parse_args()
+
+    results = merge_runs([run_benchmarks(args.benchmarks) for _ in range(args.runs)])
+    for name, reason in results['skipped'].items():
+        print(f'Skipped {name}: {reason}')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'Saved the baseline to {args.baseline}')
+        return
+
+    if not os.path.isfile(args.baseline):
+        for name, result in results['results'].items():
+            print(f'{name:<32}{result["value"]:>14.6g} {result["unit"]}')
+        print('No baseline to compare with')
+        return
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f'{len(regressions)} regressions')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
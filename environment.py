@@ -1,60 +1,94 @@
+import numpy
 import sys
 
-from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
-from PyQt5.QtGui import QFont, QKeyEvent
+from PyQt5.QtCore import Qt, QRect, QTimer, QThread, pyqtSignal
+from PyQt5.QtGui import (QBrush, QColor, QFont, QKeyEvent, QPainter,
+                         QPaintEvent, QPen)
 from PyQt5.QtWidgets import (QApplication, QGridLayout, QHBoxLayout, QLabel,
                              QPushButton, QSizePolicy, QSpacerItem,
                              QVBoxLayout, QWidget)
 
 # Custom modules
 from main.actions import Action
-from main.colors import Color, get_color_by_number, hex_to_rgba
+from main.colors import Color, get_color_number, hex_to_rgba
 from main.game_manager import GameManager
-from model.model_thread import ModelThread, ProcessType
+from main.recording import Recording, Replayer
 
 
-class GridWidget(QWidget):
-    """ A widget that represents grid with labels. """
+# Frames per second of the observed training and replays
+FRAME_RATE = 30
+
+
+class BoardWidget(QWidget):
+    """ A widget that paints a grid of colored cells.
+    
+    The widget keeps the last board it was given and repaints only the
+    cells that changed since then.
+    """
     
     def __init__(self, grid_width=10, grid_height=20):
         super().__init__()
         
         self.width = grid_width
         self.height = grid_height
-        self.labels = {}
-        rgba_value = hex_to_rgba(Color.GRAY.value, alpha=0.3)
-        self.border_color = f"border: 1px solid rgba{rgba_value};"
+        self.cells = numpy.zeros((grid_height, grid_width), dtype=numpy.uint8)
         
-        self._set_grid()
-
-    def _set_grid(self):
-        """ Sets grid built from QLabel widgets. """
-        
-        layout = QGridLayout(self)
-        layout.setSpacing(0)
-        layout.setContentsMargins(0, 0, 0, 0)
-        
-        for row in range(self.height):
-            for column in range(self.width):
-                label = QLabel()
-                label.setStyleSheet(self.border_color)
-                layout.addWidget(label, row, column)
-                self.labels[(row, column)] = label
-
-        self.setLayout(layout)
+        # Brush of every color number, the empty cell is the background
+        self.brushes = [QBrush(QColor(color.value)) for color in Color]
+        self.brushes[0] = QBrush(QColor(Color.DARK_GRAY.value))
+        self.border_pen = QPen(QColor(*hex_to_rgba(Color.GRAY.value)[:3], int(255 * 0.3)))
+        
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+    
+    def _get_cell_rect(self, row: int, column: int) -> QRect:
+        left = column * self.size().width() // self.width
+        top = row * self.size().height() // self.height
+        right = (column + 1) * self.size().width() // self.width
+        bottom = (row + 1) * self.size().height() // self.height
+        
+        return QRect(left, top, right - left, bottom - top)
     
-    def get_label(self, row: int, column: int) -> QLabel:
-        """ Gets grid's label at a specific row and column.
+    def set_board(self, board: numpy.ndarray):
+        """ Sets color numbers of the cells and schedules repainting of
+        the changed ones.
 
         Args:
-            row (int): Row number
-            column (int): Column number
+            board (numpy.ndarray): Color number of every cell.
+        """
+        
+        changed_cells = numpy.argwhere(board != self.cells)
+        if not len(changed_cells):
+            return
+        
+        self.cells[:] = board
+        for row, column in changed_cells:
+            self.update(self._get_cell_rect(row, column))  # Merged by Qt
+    
+    def paintEvent(self, event: QPaintEvent):
+        """ Paints the cells inside the rectangle that needs an update.
 
-        Returns:
-            QLabel: Label widget that represents grid cell.
+        Args:
+            event (QPaintEvent): Contains the rectangle to paint.
         """
         
-        return self.labels[(row, column)]
+        # Cells are rounded to whole pixels, one more cell on the far
+        # side keeps the cells the rectangle only touches
+        rect = event.rect()
+        size = self.size()
+        first_row = rect.top() * self.height // size.height()
+        last_row = min(rect.bottom() * self.height // size.height() + 1, self.height - 1)
+        first_column = rect.left() * self.width // size.width()
+        last_column = min(rect.right() * self.width // size.width() + 1, self.width - 1)
+        
+        painter = QPainter(self)
+        painter.setPen(self.border_pen)
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                cell_rect = self._get_cell_rect(row, column)
+                painter.fillRect(cell_rect, self.brushes[self.cells[row, column]])
+                painter.drawRect(cell_rect.adjusted(0, 0, -1, -1))
+        
+        painter.end()
 
 
 class Tetris(QWidget):
@@ -62,11 +96,16 @@ class Tetris(QWidget):
     
     send_state = pyqtSignal(tuple)
     
-    def __init__(self, train_ai: bool = False, player_ai: bool = False):
+    def __init__(self, train_ai: bool = False, player_ai: bool = False,
+                 recording: Recording = None, replay_speed: float = 10):
         super().__init__()
 
         self.train_ai = train_ai
         self.player_ai = player_ai
+        self.recording = recording
+        self.replay_speed = replay_speed  # Actions per second
+        self.replayer = None
+        self.replay_actions = 0.0  # Actions to take in the next frames
         
         self.model_thread = None
         self.height = 550
@@ -81,6 +120,8 @@ class Tetris(QWidget):
         self.manager = None
         self.background_color = "background-color: #333;"
         self.timer = None
+        self.frame_timer = None
+        self.drawn_snapshot = None
         self.score = 0
         
         self._set_ui()
@@ -149,8 +190,8 @@ class Tetris(QWidget):
     def _set_game_grid_ui(self):
         """ Sets game play grid widget. """
         
-        grid_widget = GridWidget(grid_width=self.game_grid_width,
-                                 grid_height=self.game_grid_height)
+        grid_widget = BoardWidget(grid_width=self.game_grid_width,
+                                  grid_height=self.game_grid_height)
         
         self.game_layout.setContentsMargins(0, 0, 0, 0)
         self.game_layout.addWidget(grid_widget)
@@ -166,7 +207,7 @@ class Tetris(QWidget):
         cell_width = int(self.left_panel_width / self.game_grid_width * 0.8)
         cell_height = int(self.height / self.game_grid_height * 0.8)
         
-        grid_widget = GridWidget(grid_width=grid_width, grid_height=grid_height)
+        grid_widget = BoardWidget(grid_width=grid_width, grid_height=grid_height)
         grid_widget.setFixedSize(cell_width*grid_width, cell_height*grid_height)
         
         self.next_layout.setContentsMargins(0, 0, 0, 0)
@@ -174,31 +215,17 @@ class Tetris(QWidget):
         self.next_grid_ui = grid_widget
         
     def _draw_grid(self):
-        for row in range(self.manager.board_height):
-            for column in range(self.manager.board_width):
-                label = self.game_grid_ui.get_label(row, column)
-                value = self.manager.board[row][column]
-                if value != 0:
-                    color = get_color_by_number(value)
-                    label.setStyleSheet(
-                        f"background-color: {color}; {self.game_grid_ui.border_color}")
-                else:
-                    label.setStyleSheet(self.game_grid_ui.border_color)
-
-    def _draw_next_grid(self):
-        # Clear next grid
-        for row in range(self.next_grid_ui.height):
-            for column in range(self.next_grid_ui.width):
-                label = self.next_grid_ui.get_label(row, column)
-                label.setStyleSheet(self.next_grid_ui.border_color)
+        self.game_grid_ui.set_board(self.manager.board)
 
-        # Draw the next piece
-        for row, column in self.manager.next_piece.shape:
-            label = self.next_grid_ui.get_label(row, column+1)
-            label.setStyleSheet((
-                f"background-color: {self.manager.next_piece.color};"
-                f" {self.game_grid_ui.border_color}"
-            ))
+    def _draw_next_grid(self, next_piece=None):
+        next_piece = next_piece or self.manager.next_piece
+        next_board = numpy.zeros((self.next_grid_ui.height, self.next_grid_ui.width),
+                                 dtype=numpy.uint8)
+        color_number = get_color_number(next_piece.color)
+        for row, column in next_piece.shape:
+            next_board[row, column + 1] = color_number
+        
+        self.next_grid_ui.set_board(next_board)
     
     def _set_game_sync(self):
         self.timer = QTimer(self)
@@ -206,17 +233,57 @@ class Tetris(QWidget):
         self.timer.start(1000)  # Update every second
     
     def _set_training(self):
+        # Model modules are loaded only for AI players
+        from model.model_thread import ModelThread, ProcessType
+        
         self.model_thread = ModelThread(self.game_grid_height,
                                         self.game_grid_width,
                                         ProcessType.TRAINING)
         
-        self.model_thread.reset.connect(self.reset)
-        self.model_thread.step.connect(self.step)
+        # Training doesn't wait for the GUI, which draws the latest
+        # snapshot of the training game at a fixed frame rate
+        self.frame_timer = QTimer(self)
+        self.frame_timer.timeout.connect(self._draw_snapshot)
+        self.frame_timer.start(1000 // FRAME_RATE)
         
-        self.send_state.connect(self.model_thread.receive_state)
         self.model_thread.start()
     
+    def _set_replay(self):
+        self.replayer = Replayer(self.recording)
+        self.replay_actions = 0.0
+        
+        self.frame_timer = QTimer(self)
+        self.frame_timer.timeout.connect(self._draw_replay)
+        self.frame_timer.start(1000 // FRAME_RATE)
+    
+    def _draw_replay(self):
+        # Any speed is split into whole actions per frame
+        self.replay_actions += self.replay_speed / FRAME_RATE
+        actions_number = int(self.replay_actions)
+        self.replay_actions -= actions_number
+        
+        board, score, _ = self.replayer.step(actions_number)
+        if self.replayer.is_over():
+            self.frame_timer.stop()
+        
+        self.game_grid_ui.set_board(board)
+        self._draw_next_grid(self.replayer.manager.next_piece)
+        self.score_label.setText(str(score))
+    
+    def _draw_snapshot(self):
+        snapshot = self.model_thread.snapshot
+        if snapshot is None or snapshot is self.drawn_snapshot:
+            return
+        
+        # Snapshots published since the last frame are skipped
+        self.drawn_snapshot = snapshot
+        self.game_grid_ui.set_board(snapshot.board)
+        self._draw_next_grid(snapshot.next_piece)
+        self.score_label.setText(str(snapshot.score))
+    
     def _set_playing(self):
+        from model.model_thread import ModelThread, ProcessType
+        
         self.model_thread = ModelThread(self.game_grid_height,
                                         self.game_grid_width,
                                         ProcessType.PLAYING)
@@ -238,7 +305,7 @@ class Tetris(QWidget):
             event (QKeyEvent): Contains information about the key event.
         """
         
-        if self._is_ai_player():
+        if self._is_ai_player() or self.recording:
             return
         
         if event.key() == Qt.Key_Left:
@@ -257,12 +324,17 @@ class Tetris(QWidget):
         
         self.score = 0
         
+        if self.recording:
+            if not self.replayer:
+                self._set_replay()
+            return
+        
         if not self.manager:
             self.manager = GameManager(used_in_gui=True)
             
         self.manager.reset()
         
-        if not self.timer:
+        if not self.timer and not self.train_ai:
             self._set_game_sync()
 
         if not self.model_thread:
@@ -271,8 +343,9 @@ class Tetris(QWidget):
             elif self.player_ai:
                 self._set_playing()
         
-        if self.model_thread:
-            self.send_state.emit((self.manager.board, 0, False))
+        if self.player_ai:
+            # The model gets a copy, the board is changed by the GUI thread
+            self.send_state.emit((self.manager.board.copy(), 0, False))
         
     def step(self, action: int) -> tuple:
         """ Updates environment according to given action.
@@ -309,7 +382,7 @@ class Tetris(QWidget):
         
         if self._is_ai_player():
             ai_score = self.manager.get_score()  # TODO: Doesn't clear lines correctly
-            self.send_state.emit((self.manager.board, ai_score, game_over))
+            self.send_state.emit((self.manager.board.copy(), ai_score, game_over))
         
         return self.manager.board, filled_lines, game_over
 
@@ -0,0 +1,19 @@
+import sys
+
+from keras.models import load_model
+
+from model.numpy_model import export_weights
+
+
+MODEL_FILE_PATH = 'model.keras'
+WEIGHTS_FILE_PATH = 'model.npz'
+
+
+if __name__ == '__main__':
+    # Optional paths: python export_model.py [model file] [weights file]
+    model_file_path = sys.argv[1] if len(sys.argv) > 1 else MODEL_FILE_PATH
+    weights_file_path = sys.argv[2] if len(sys.argv) > 2 else WEIGHTS_FILE_PATH
+
+    model = load_model(model_file_path)
+    export_weights(model, weights_file_path)
+    print(f'Exported {model_file_path} to {weights_file_path}')
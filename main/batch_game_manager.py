@@ -0,0 +1,240 @@
+import numpy
+
+# Custom modules
+from main.actions import Action
+from main.game_manager import GRAVITY_INTERVAL, PIECE_COLORS
+from main.grid import Grid
+from main.pieces import GAME_PIECE_TYPES, PIECES, ROTATIONS
+
+
+# Piece movement of every action: rotation, row and column change
+ROTATION_CHANGE = numpy.zeros(len(Action), dtype=numpy.int64)
+ROW_CHANGE = numpy.zeros(len(Action), dtype=numpy.int64)
+COLUMN_CHANGE = numpy.zeros(len(Action), dtype=numpy.int64)
+ROTATION_CHANGE[Action.UP.value] = 1
+ROW_CHANGE[Action.DOWN.value] = 1
+COLUMN_CHANGE[Action.LEFT.value] = -1
+COLUMN_CHANGE[Action.RIGHT.value] = 1
+
+
+class BatchGameManager:
+    """ A game manager that runs a batch of games at once.
+
+    Boards of all the games are kept in a single (games, height, width)
+    array and every step moves, locks and clears all of them with a few
+    NumPy operations. A game that is over is reset automatically.
+
+    Same as in GameManager, a new piece isn't drawn on the observed
+    board until it moves for the first time.
+    """
+    def __init__(self, games_number: int, seed=None,
+                 gravity_interval=GRAVITY_INTERVAL):
+        grid = Grid()
+        self.games_number = games_number
+        self.gravity_interval = gravity_interval
+        self.board_height = grid.height
+        self.board_width = grid.width
+        self.random = numpy.random.default_rng(seed)
+        self.games = numpy.arange(games_number)
+
+        self.piece_types = numpy.array(GAME_PIECE_TYPES, dtype=numpy.int64)
+        self.colors = numpy.array(PIECE_COLORS, dtype=numpy.int32)
+
+        # Every piece has 4 rotation states, pieces with fewer states
+        # repeat them, so a rotation is always taken modulo 4.
+        # Shape: (piece types, rotations, cells, row and column)
+        self.offsets = numpy.array(
+            [[states[i % len(states)].cells for i in range(4)] for states in ROTATIONS],
+            dtype=numpy.int64)
+        self.rotations_numbers = numpy.array([len(states) for states in ROTATIONS])
+
+        # Pivot cell location of a new piece, same as in GameManager
+        middle = self.board_width // 2 - 1
+        self.initial_locations = numpy.array(
+            [piece.get_pivot_cell() or piece.shape[0] for piece in PIECES],
+            dtype=numpy.int64) + [-1, middle]
+
+        shape = (games_number, self.board_height, self.board_width)
+        self.boards = numpy.zeros(shape, dtype=numpy.int32)  # Locked cells
+        self.observations = numpy.zeros(shape, dtype=numpy.int32)
+
+        self.piece = numpy.zeros(games_number, dtype=numpy.int64)
+        self.next_piece = numpy.zeros(games_number, dtype=numpy.int64)
+        self.rotation = numpy.zeros(games_number, dtype=numpy.int64)
+        self.row = numpy.zeros(games_number, dtype=numpy.int64)
+        self.column = numpy.zeros(games_number, dtype=numpy.int64)
+        self.ticks = numpy.zeros(games_number, dtype=numpy.int64)
+        self.drawn = numpy.zeros(games_number, dtype=bool)  # Piece has moved
+        self.gaps = numpy.zeros(games_number, dtype=numpy.int64)
+
+        self.reset()
+
+    def _get_cells(self, games, rotation, row, column) -> tuple:
+        offsets = self.offsets[self.piece[games], rotation % 4]
+        rows = row[:, None] + offsets[..., 0]
+        columns = column[:, None] + offsets[..., 1]
+        return rows, columns
+
+    def _fits(self, games, rows, columns) -> numpy.ndarray:
+        inside = (columns >= 0) & (columns < self.board_width) & (rows < self.board_height)
+        occupied = self.boards[
+            games[:, None],
+            rows.clip(0, self.board_height - 1),
+            columns.clip(0, self.board_width - 1)
+        ] != 0
+
+        # Cells above the board are free
+        return numpy.all(inside & ~(occupied & (rows >= 0)), axis=1)
+
+    def _move(self, games, rotation_value, row_value, column_value) -> numpy.ndarray:
+        rotation = self.rotation[games] + rotation_value
+        row = self.row[games] + row_value
+        column = self.column[games] + column_value
+
+        fits = self._fits(games, *self._get_cells(games, rotation, row, column))
+        moved = games[fits]
+        self.rotation[moved] = rotation[fits] % 4
+        self.row[moved] = row[fits]
+        self.column[moved] = column[fits]
+
+        # Rotating a piece of a single rotation state doesn't move it, same
+        # as in GameManager
+        drawn = fits & ((rotation_value == 0)
+                        | (self.rotations_numbers[self.piece[games]] > 1))
+        self.drawn[games[drawn]] = True
+
+        return fits
+
+    def _get_random_pieces(self, pieces_number: int) -> numpy.ndarray:
+        return self.piece_types[self.random.integers(
+            len(self.piece_types), size=pieces_number)]
+
+    def _set_new_pieces(self, games):
+        self.piece[games] = self.next_piece[games]
+        self.next_piece[games] = self._get_random_pieces(len(games))
+        self.rotation[games] = 0
+        self.row[games] = self.initial_locations[self.piece[games], 0]
+        self.column[games] = self.initial_locations[self.piece[games], 1]
+        self.ticks[games] = 0
+        self.drawn[games] = False
+
+    def _lock_pieces(self, games, cleared_lines, game_over):
+        rows, columns = self._get_cells(
+            games, self.rotation[games], self.row[games], self.column[games])
+        colors = numpy.broadcast_to(self.colors[self.piece[games], None], rows.shape)
+        games_cells = numpy.broadcast_to(games[:, None], rows.shape)
+
+        visible = rows >= 0
+        self.boards[games_cells[visible], rows[visible], columns[visible]] = colors[visible]
+
+        cleared_lines[games] += self._clear_filled_lines(games)
+        self.gaps[games] = self._count_gaps(self.boards[games])
+        game_over[games] |= self.boards[games, 0].any(axis=1)
+        self._set_new_pieces(games)
+
+    def _clear_filled_lines(self, games) -> numpy.ndarray:
+        boards = self.boards[games]
+        filled_lines = numpy.all(boards != 0, axis=2)
+        cleared_lines = filled_lines.sum(axis=1)
+
+        if cleared_lines.any():
+            # Stable sort moves filled lines to the top keeping the order
+            # of the other lines, then the filled lines are emptied.
+            order = numpy.argsort(~filled_lines, axis=1, kind='stable')
+            boards = numpy.take_along_axis(boards, order[:, :, None], axis=1)
+            boards[numpy.arange(self.board_height) < cleared_lines[:, None]] = 0
+            self.boards[games] = boards
+
+        return cleared_lines
+
+    def _update_observations(self, games):
+        self.observations[games] = self.boards[games]
+
+        # New pieces that haven't moved yet aren't drawn
+        games = games[self.drawn[games]]
+        rows, columns = self._get_cells(
+            games, self.rotation[games], self.row[games], self.column[games])
+        colors = numpy.broadcast_to(self.colors[self.piece[games], None], rows.shape)
+        games_cells = numpy.broadcast_to(games[:, None], rows.shape)
+
+        visible = rows >= 0
+        self.observations[games_cells[visible], rows[visible], columns[visible]] = colors[visible]
+
+    def _count_gaps(self, boards) -> numpy.ndarray:
+        filled_cells = numpy.count_nonzero(boards, axis=2)[:, ::-1]
+        stack_lines = numpy.cumprod(filled_cells > 0, axis=1)
+        return ((self.board_width - filled_cells) * stack_lines).sum(axis=1)
+
+    def get_gaps_in_lines(self) -> numpy.ndarray:
+        """ Gets the number of gaps (empty spaces) in the lines of every
+        board, from the bottom up to the first empty line. The counts
+        are updated when pieces are locked, same as in GameManager.
+
+        Returns:
+            numpy.ndarray: The total number of gaps of every game.
+        """
+
+        return self.gaps
+
+    def reset_games(self, games):
+        """ Resets the given games.
+
+        Args:
+            games (numpy.ndarray): Indices of the games to reset.
+        """
+
+        self.boards[games] = 0
+        self.gaps[games] = 0
+        self.next_piece[games] = self._get_random_pieces(len(games))
+        self._set_new_pieces(games)
+        self._update_observations(games)
+
+    def reset(self) -> numpy.ndarray:
+        """ Resets all the games.
+
+        Returns:
+            numpy.ndarray: Boards of all the games.
+        """
+
+        self.reset_games(self.games)
+        return self.observations
+
+    def step(self, actions: numpy.ndarray) -> tuple:
+        """ Updates all the games according to given actions.
+
+        Args:
+            actions (numpy.ndarray): In game action value for every game.
+
+        Returns:
+            Boards of all the games, their scores and whether each game
+            is over. Games that are over are already reset, so their
+            boards are the initial boards of the new games. The boards
+            array is reused by the next step.
+        """
+
+        actions = numpy.asarray(actions)
+        fits = self._move(self.games, ROTATION_CHANGE[actions],
+                          ROW_CHANGE[actions], COLUMN_CHANGE[actions])
+
+        cleared_lines = numpy.zeros(self.games_number, dtype=numpy.int64)
+        game_over = numpy.zeros(self.games_number, dtype=bool)
+
+        # A piece that can't move down is locked
+        locked = self.games[(actions == Action.DOWN.value) & ~fits]
+        self._lock_pieces(locked, cleared_lines, game_over)
+
+        # Gravity of the simulated clock, same as GameManager.tick
+        if self.gravity_interval:
+            self.ticks += 1
+            falling = self.games[(self.ticks >= self.gravity_interval) & ~game_over]
+            self.ticks[falling] = 0
+            fits = self._move(falling, 0, 1, 0)
+            self._lock_pieces(falling[~fits], cleared_lines, game_over)
+
+        self._update_observations(self.games)
+        rewards = cleared_lines * 100 - self.get_gaps_in_lines() * 10
+
+        if game_over.any():
+            self.reset_games(self.games[game_over])
+
+        return self.observations, rewards, game_over
@@ -0,0 +1,157 @@
+class BitBoard:
+    """ A board that stores every row as an integer bitmask.
+
+    Bit `column` of a row is set when the cell is occupied by a locked
+    piece, so collision, locking and full row detection are a handful
+    of bitwise operations instead of per-cell array lookups.
+
+    Board statistics are updated only when a piece is locked:
+    `row_counts` (filled cells of every row), `heights` (height of every
+    column), `holes` (empty cells below the column tops), `bumpiness`
+    (sum of height differences of neighbour columns) and `gaps` (empty
+    cells in the rows of the stack, from the bottom up to the first
+    empty row).
+    """
+
+    def __init__(self, width=10, height=20):
+        self.width = width
+        self.height = height
+        self.full_row = (1 << width) - 1
+
+        # Number of filled cells for every possible row value
+        self.cells_counts = [bin(row).count('1') for row in range(self.full_row + 1)]
+
+        self.rows = []
+        self.row_counts = []
+        self.heights = []
+        self.filled_cells = 0
+        self.holes = 0
+        self.bumpiness = 0
+        self.gaps = 0
+
+        self.reset()
+
+    def reset(self):
+        """ Empties all the rows of the board. """
+
+        self.rows = [0] * self.height
+        self.row_counts = [0] * self.height
+        self.heights = [0] * self.width
+        self.filled_cells = 0
+        self.holes = 0
+        self.bumpiness = 0
+        self.gaps = 0
+
+    def fits(self, masks: tuple, row: int, column: int) -> bool:
+        """ Checks whether a piece is inside the board walls and doesn't
+        overlap locked cells. Cells above the board are free.
+
+        Args:
+            masks (tuple): (row offset, bits) pairs of the piece, bit 0
+                is the leftmost column of the piece.
+            row (int): Row the offsets are relative to.
+            column (int): Leftmost column of the piece.
+
+        Returns:
+            bool: True if the piece can be placed there.
+        """
+
+        if column < 0:
+            return False
+
+        rows = self.rows
+        for row_offset, bits in masks:
+            bits <<= column
+            index = row + row_offset
+            if bits > self.full_row or index >= self.height:
+                return False
+
+            if index >= 0 and rows[index] & bits:
+                return False
+
+        return True
+
+    def lock(self, masks: tuple, row: int, column: int) -> list:
+        """ Marks the cells of a piece as occupied, clears the rows it
+        filled and updates the board statistics.
+
+        Args:
+            masks (tuple): (row offset, bits) pairs of the piece, bit 0
+                is the leftmost column of the piece.
+            row (int): Row the offsets are relative to.
+            column (int): Leftmost column of the piece.
+
+        Returns:
+            list: Indices of the cleared rows, from top to bottom.
+        """
+
+        rows = self.rows
+        row_counts = self.row_counts
+        heights = self.heights
+        full_rows = []
+
+        for row_offset, bits in masks:
+            index = row + row_offset
+            if index < 0:
+                continue
+
+            bits <<= column
+            rows[index] |= bits
+            row_counts[index] += self.cells_counts[bits]
+            self.filled_cells += self.cells_counts[bits]
+            if rows[index] == self.full_row:
+                full_rows.append(index)
+
+            cell_height = self.height - index
+            while bits:
+                lowest_bit = bits & -bits
+                col = lowest_bit.bit_length() - 1
+                if heights[col] < cell_height:
+                    heights[col] = cell_height
+                bits ^= lowest_bit
+
+        if full_rows:
+            self._clear_rows(full_rows)
+
+        self._update_stats()
+
+        return full_rows
+
+    def _clear_rows(self, full_rows: list):
+        cleared = set(full_rows)
+        self.rows = [0] * len(full_rows) + [
+            row for index, row in enumerate(self.rows) if index not in cleared]
+        self.row_counts = [0] * len(full_rows) + [
+            count for index, count in enumerate(self.row_counts) if index not in cleared]
+        self.filled_cells -= self.width * len(full_rows)
+
+        # Column tops can't be shifted, as the top cell itself may be
+        # cleared, so they are found again from the top
+        heights = [0] * self.width
+        seen = 0
+        for index, row in enumerate(self.rows):
+            new_cells = row & ~seen
+            while new_cells:
+                lowest_bit = new_cells & -new_cells
+                heights[lowest_bit.bit_length() - 1] = self.height - index
+                new_cells ^= lowest_bit
+
+            seen |= row
+            if seen == self.full_row:
+                break
+
+        self.heights = heights
+
+    def _update_stats(self):
+        heights = self.heights
+        self.holes = sum(heights) - self.filled_cells
+        self.bumpiness = sum(abs(left - right) for left, right in zip(heights, heights[1:]))
+
+        gaps = 0
+        for count in reversed(self.row_counts):
+            if not count:
+                break
+
+            gaps += self.width - count
+
+        self.gaps = gaps
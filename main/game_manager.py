@@ -1,166 +1,160 @@
 import numpy
 import random
-import time
-from copy import deepcopy
-from threading import Thread
 
 # Custom modules
 from main.actions import Action
+from main.bitboard import BitBoard
 from main.colors import get_color_number
 from main.grid import Grid
-from main.pieces import create_game_pieces
+from main.pieces import GAME_PIECE_TYPES, PIECES, ROTATIONS, get_drop_table
+from main.recording import Recording
+
+
+# Number of agent actions between two moves of a piece down by gravity
+GRAVITY_INTERVAL = 10
+
+# Color number of every piece, indexed by piece type
+PIECE_COLORS = tuple(get_color_number(piece.color) for piece in PIECES)
 
 
 class GameManager:
     """ A game manager responsible for piece movement and rotation on a
     grid, clearing grid and counting score.
+    
+    Locked cells are tracked on a `BitBoard`, while `board` keeps the
+    colored view of the grid, including the falling piece. The falling
+    piece is its type, rotation and pivot cell location, and its cells
+    are taken from the precomputed rotation tables.
+    
+    Filled lines are cleared and board statistics are updated as soon
+    as a piece is locked, so the score doesn't scan the board.
+    
+    Every game draws its pieces from its own random generator, seeded
+    with the game's seed, so a game is rebuilt from its seed and
+    actions. With `record`, actions of `step` are kept in `recording`.
     """
-    def __init__(self, used_in_gui=False):
+    def __init__(self, used_in_gui=False, gravity_interval=GRAVITY_INTERVAL,
+                 seed=None, record=False):
         self.grid = None
         self.board = None
         self.board_height = 0
         self.board_width = 0
+        self.bitboard = None
         self.piece = None
+        self.piece_type = 0
+        self.piece_color = 0
+        self.piece_cells = []
+        self.rotation = 0
+        self.row = 0
+        self.column = 0
         self.cleared_lines = 0
+        self.filled_lines = 0
         self.used_in_gui = used_in_gui
-        self.timer_thread = None
+        self.gravity_interval = gravity_interval
+        self.ticks = 0
+        
+        # Seeds of the games, a game's seed is drawn when it's reset
+        self.seeds = random.Random(seed)
+        self.seed = 0
+        self.random = None
+        self.record = record
+        self.recording = None
         
-        self.pieces = []
         self.next_piece = None
+        self.next_piece_type = 0
         
         self.reset()
     
-    def _set_piece_initial_location(self):
-        middle = self.board_width // 2 - 1
-        for cell in self.piece.shape:
-            cell[0] -= 1
-            cell[1] += middle
-    
     def _update_board(self):
-        for row, column in self.piece.shape:
+        for row, column in self.piece_cells:
             if row >= 0:
-                self.board[row][column] = get_color_number(self.piece.color)
+                self.board[row, column] = self.piece_color
     
     def _clear_previous_location(self):
-        for row, column in self.piece.shape:
+        for row, column in self.piece_cells:
             if row >= 0:
-                self.board[row][column] = 0
-    
-    def _get_bottom_cells(self) -> list:
-        min_column = min(cell[1] for cell in self.piece.shape)
-        max_column = max(cell[1] for cell in self.piece.shape)
-        bottom_cells = []
-        
-        # Group by columns
-        for column in range(min_column, max_column+1):
-            rows = [cell for cell in self.piece.shape if cell[1] == column]
-            bottom_row = max(cell[0] for cell in rows)
-            bottom_cells.append([bottom_row, column])
-            
-        return bottom_cells
-    
-    def _get_right_cells(self) -> list:
-        min_row = min(cell[0] for cell in self.piece.shape)
-        max_row = max(cell[0] for cell in self.piece.shape)
-        right_cells = []
-        
-        # Group by rows
-        for row in range(min_row, max_row+1):
-            columns = [cell for cell in self.piece.shape if cell[0] == row]
-            right_column = max(cell[1] for cell in columns)
-            right_cells.append([row, right_column])
-        
-        return right_cells
+                self.board[row, column] = 0
     
-    def _get_left_cells(self) -> list:
-        min_row = min(cell[0] for cell in self.piece.shape)
-        max_row = max(cell[0] for cell in self.piece.shape)
-        left_cells = []
-        
-        # Group by rows
-        for row in range(min_row, max_row+1):
-            columns = [cell for cell in self.piece.shape if cell[0] == row]
-            left_column = min(cell[1] for cell in columns)
-            left_cells.append([row, left_column])
-        
-        return left_cells
+    def _set_piece_location(self, rotation: int, row: int, column: int):
+        self.rotation = rotation
+        self.row = row
+        self.column = column
+        self.piece_cells = [(row + row_offset, column + column_offset)
+                            for row_offset, column_offset
+                            in ROTATIONS[self.piece_type][rotation].cells]
     
-    def _update_piece_location(self, row_value: int, column_value: int):
+    def _update_piece_location(self, rotation: int, row: int, column: int) -> bool:
+        state = ROTATIONS[self.piece_type][rotation]
+        if not self.bitboard.fits(state.masks, row, column + state.left):
+            return False
+        
         self._clear_previous_location()
+        self._set_piece_location(rotation, row, column)
+        self._update_board()
         
-        for cell in self.piece.shape:
-            cell[0] += row_value
-            cell[1] += column_value
-            
+        return True
+    
+    def _lock_piece(self):
+        # A new piece isn't drawn until it moves, it may be locked before
         self._update_board()
+        
+        state = ROTATIONS[self.piece_type][self.rotation]
+        full_rows = self.bitboard.lock(state.masks, self.row, self.column + state.left)
+        
+        if full_rows:
+            kept_rows = numpy.delete(self.board, full_rows, axis=0)
+            self.board[:len(full_rows)] = 0
+            self.board[len(full_rows):] = kept_rows
+            
+            self.filled_lines += len(full_rows)
+            self.cleared_lines += len(full_rows)
+        
+        self._set_new_piece()
     
     def _set_new_piece(self):
         """ Selects a new piece randomly from the available pieces and
         sets it as the current piece.
         """
         
-        self.piece = deepcopy(self.next_piece)
-        self._set_piece_initial_location()
-        
-        self.next_piece = deepcopy(random.choice(self.pieces))
-    
-    def _is_occupied(self, row: int, col: int) -> bool:
-        return self.board[row][col] != 0 and [row, col] not in self.piece.shape
-    
-    def _rotatable(self, row: int, col: int) -> bool:
-        if col < 0 or col >= self.board_width or row >= self.board_height:
-            return False
+        self.piece_type = self.next_piece_type
+        self.piece = self.next_piece
+        self.piece_color = PIECE_COLORS[self.piece_type]
         
-        if row >= 0 and row < self.board_height and self._is_occupied(row, col):
-            return False
+        # Pivot cell location of the initial shape, one row above the
+        # board in the middle
+        row, column = self.piece.get_pivot_cell() or self.piece.shape[0]
+        self._set_piece_location(0, row - 1, column + self.board_width // 2 - 1)
+        self.ticks = 0
         
-        return True
-    
-    def _is_empty_line(self, line: list) -> bool:
-        return all(value == 0 for value in line)
+        self.next_piece_type = self.random.choice(GAME_PIECE_TYPES)
+        self.next_piece = PIECES[self.next_piece_type]
     
     def clear_filled_lines(self) -> int:
-        """ Clears fully filled lines from the game board and shifts the
-        rows above down to fill the cleared space.
+        """ Collects fully filled lines that were cleared from the game
+        board. Lines are cleared and the rows above are shifted down as
+        soon as a piece is locked.
 
         Returns:
-            int: The number of rows that were cleared from the board.
+            int: The number of rows that were cleared from the board
+                since the last call.
         """
 
-        cleared_rows = 0
-        new_board = numpy.zeros_like(self.board, dtype=numpy.int32)
-        new_row_index = self.board_height - 1
-
-        for row_index in range(self.board_height-1, -1, -1):
-            row = self.board[row_index]
-            if not all(value != 0 for value in row):
-                new_board[new_row_index] = row
-                new_row_index -= 1
-            else:
-                cleared_rows += 1
-
-        self.board = new_board
+        filled_lines = self.filled_lines
+        self.filled_lines = 0
         
-        return cleared_rows
+        return filled_lines
     
     def get_gaps_in_lines(self) -> int:
         """
         Counts the number of gaps (empty spaces) in the lines of the
-        Tetris board.
+        Tetris board. The count is kept up to date when a piece is
+        locked, the falling piece isn't a part of it.
 
         Returns:
             int: The total number of gaps found in the board.
         """
         
-        gaps = 0
-        for row_index in range(self.board_height-1, -1, -1):
-            if self._is_empty_line(self.board[row_index]):
-                return gaps
-            
-            sum_of_gaps = sum(1 for value in self.board[row_index] if value == 0)
-            gaps += int(sum_of_gaps)
-        
-        return gaps
+        return self.bitboard.gaps
     
     def is_game_over(self) -> bool:
         """ Checks if the game is over by determining if any part of
@@ -170,28 +164,17 @@ class GameManager:
             bool: True if the game is over, False otherwise.
         """
         
-        top_row = self.board[0]
-        return any(value != 0 for value in top_row)
+        return self.bitboard.rows[0] != 0
     
     def move_right(self):
         """ Moves game piece right within game's grid. """
         
-        for cell in self._get_right_cells():
-            row, column = cell
-            if column+1 >= self.board_width or (row >= 0 and self.board[row][column+1] != 0):
-                return
-            
-        self._update_piece_location(0, 1)
+        self._update_piece_location(self.rotation, self.row, self.column + 1)
     
     def move_left(self):
         """ Moves game piece left within game's grid. """
         
-        for cell in self._get_left_cells():
-            row, column = cell
-            if column-1 < 0 or (row >= 0 and self.board[row][column-1] != 0):
-                return
-            
-        self._update_piece_location(0, -1)
+        self._update_piece_location(self.rotation, self.row, self.column - 1)
     
     def move_down(self) -> bool:
         """ Moves game piece down by 1 cell.
@@ -203,36 +186,21 @@ class GameManager:
             bool: Whether a piece is down.
         """
 
-        for cell in self._get_bottom_cells():
-            row, column = cell
-            if row+1 >= self.board_height or self.board[row+1][column] != 0:
-                self._set_new_piece()
-                return True
+        if self._update_piece_location(self.rotation, self.row + 1, self.column):
+            return False
         
-        self._update_piece_location(1, 0)
+        self._lock_piece()
         
-        return False
+        return True
     
     def rotate(self):
         """ Rotates game piece in 90 degrees within game's grid. """
-        pivot_cell = self.piece.get_pivot_cell()
-        if not pivot_cell:
+        rotations_number = len(ROTATIONS[self.piece_type])
+        if rotations_number == 1:
             return
         
-        pivot_row, pivot_col = pivot_cell
-        new_shape = []
-        
-        for row, col in self.piece.shape:
-            new_row = (col - pivot_col) + pivot_row
-            new_col = -(row - pivot_row) + pivot_col
-            if not self._rotatable(new_row, new_col):
-                return
-            
-            new_shape.append([new_row, new_col])
-        
-        self._clear_previous_location()
-        self.piece.shape = new_shape
-        self._update_board()
+        self._update_piece_location((self.rotation + 1) % rotations_number,
+                                    self.row, self.column)
     
     def get_score(self) -> int:
         """ Returns the score of current state, including cleared lines
@@ -246,31 +214,95 @@ class GameManager:
         score -= (self.get_gaps_in_lines() * 10)
         return score
     
-    def reset(self):
-        """ Resets game stats. """
+    def get_placements(self) -> list:
+        """ Gets every final placement of the current piece, when it's
+        rotated and then dropped straight down.
+
+        Returns:
+            list: (rotation, column) pairs, where rotation is a number of
+                rotations of the initial shape and column is the leftmost
+                column of the piece.
+        """
+        
+        return list(get_drop_table(self.piece_type, self.board_width))
+    
+    def place(self, rotation: int, column: int) -> tuple:
+        """ Drops the current piece in a given placement and locks it,
+        all in one call.
+
+        Args:
+            rotation (int): Number of rotations of the initial shape.
+            column (int): Leftmost column of the piece.
+
+        Returns:
+            Next state after the placement, same as `step`.
+
+        Raises:
+            RuntimeError: If the game is recorded, recordings keep only
+                the actions of `step`.
+        """
+        
+        if self.recording is not None:
+            raise RuntimeError('Placements are not recorded, a recorded game takes steps')
+        
+        drop_table = get_drop_table(self.piece_type, self.board_width)
+        pivot_column, bottoms = drop_table[(rotation, column)]
+        heights = self.bitboard.heights
+        pivot_row = min(self.board_height - heights[col] - 1 - bottom
+                        for col, bottom in bottoms)
+        
+        self._clear_previous_location()
+        self._set_piece_location(rotation, pivot_row, pivot_column)
+        self._lock_piece()
+        
+        return self.board, self.get_score(), self.is_game_over()
+    
+    def reset(self, seed=None):
+        """ Resets game stats and starts a new game.
+        
+        Args:
+            seed (int, optional): Seed of the game's pieces. By default
+                a new seed is drawn.
+        """
+        
+        self.seed = self.seeds.getrandbits(64) if seed is None else seed
+        self.random = random.Random(self.seed)
+        if self.record:
+            gravity_interval = 0 if self.used_in_gui else self.gravity_interval
+            self.recording = Recording(self.seed, gravity_interval)
         
         self.grid = Grid()
         self.board = self.grid.board
         self.board_height = self.grid.height
         self.board_width = self.grid.width
-        self.piece = None
+        self.bitboard = BitBoard(self.board_width, self.board_height)
         self.cleared_lines = 0
+        self.filled_lines = 0
         
-        
-        self.pieces = create_game_pieces()
-        self.next_piece = deepcopy(random.choice(self.pieces))
+        self.next_piece_type = self.random.choice(GAME_PIECE_TYPES)
+        self.next_piece = PIECES[self.next_piece_type]
         self._set_new_piece()
+    
+    def tick(self) -> bool:
+        """ Advances the game's clock by one tick. The piece moves down
+        by 1 cell every `gravity_interval` ticks of its lifetime.
         
-        if not self.used_in_gui:
-            # When GameManager used outside of GUI it should synchronize
-            # movement of a piece down by itself
-            if self.timer_thread:
-                self.game_restarted = True
-                self.timer_thread.join()
-                
-            self.game_restarted = False
-            self.timer_thread = Thread(target=move_piece_down, args=(self,))
-            self.timer_thread.start()
+        In GUI the piece is moved down by the GUI timer instead, so the
+        clock doesn't run there.
+        
+        Returns:
+            bool: Whether a piece is down.
+        """
+        
+        if self.used_in_gui or not self.gravity_interval:
+            return False
+        
+        self.ticks += 1
+        if self.ticks < self.gravity_interval:
+            return False
+        
+        self.ticks = 0
+        return self.move_down()
             
     def step(self, action: int) -> tuple:
         """ Updates environment according to given action.
@@ -284,7 +316,10 @@ class GameManager:
             it's a game over.
         """
         
-        game_over = False
+        is_down = False
+        
+        if self.recording is not None:
+            self.recording.add(action)
         
         if action == Action.LEFT.value:
             self.move_left()
@@ -294,25 +329,11 @@ class GameManager:
             self.rotate()
         elif action == Action.DOWN.value:
             is_down = self.move_down()
-            if is_down:
-                if self.is_game_over():
-                    game_over = True
         
-        return self.board, self.get_score(), game_over
-    
-
-def move_piece_down(game_manager: GameManager):
-    """ Moves game's piece down by 1 row each second.
-
-    Args:
-        game_manager (GameManager): Tetris game manager that manages
-            the board and the piece.
-    """
-    
-    while True:
-        # TODO: Can teach model on a board instead of a GUI, but probably need to lock with Mutex
-        if game_manager.game_restarted:
-            break
+        # Gravity of the simulated clock, one tick per action
+        if self.tick():
+            is_down = True
         
-        game_manager.move_down()
-        time.sleep(1)
+        game_over = is_down and self.is_game_over()
+        
+        return self.board, self.get_score(), game_over
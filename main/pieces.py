@@ -1,79 +1,185 @@
+from enum import IntEnum
+from functools import lru_cache
+from typing import NamedTuple
+
 from main.colors import Color
 
 
 class Piece:
     """ A class that represents a playable piece in the Tetris game. """
-    
-    def __init__(self, color: str, shape: list, pivot_index: int):
+
+    def __init__(self, color: str, shape: tuple, pivot_index: int):
         self.color = color
         self.shape = shape
         self.pivot_index = pivot_index
-    
-    def get_pivot_cell(self) -> list:
+
+    def get_pivot_cell(self) -> tuple:
         """ Gets a pivot cell of the shape. """
-        
+
         if self.pivot_index == -1:
             # No need to rotate
-            return []
-        
+            return ()
+
         return self.shape[self.pivot_index]
 
 
+class PieceType(IntEnum):
+    """ Tetromino definitions, index in the pieces tables. """
+    T = 0
+    L = 1
+    S = 2
+    J = 3
+    Z = 4
+    O = 5
+    I = 6
+
+
+class Rotation(NamedTuple):
+    """ A rotation state of a piece, relative to its pivot cell. """
+
+    # (row, column) offsets of the cells from the pivot cell
+    cells: tuple
+    # Column offset of the leftmost cell
+    left: int
+    # (row offset, bits) pairs, bit 0 is the leftmost column
+    masks: tuple
+
+
+def get_rotation_offsets(piece: Piece) -> list:
+    """ Gets cells offsets from the pivot cell for every rotation state
+    of a piece, in the order the piece is rotated by the game.
+
+    Args:
+        piece (Piece): A piece in its initial shape.
+
+    Returns:
+        list: A list of rotation states, each one is a tuple of
+            (row, column) offsets. Pieces without a pivot cell have a
+            single state with offsets from their first cell.
+    """
+
+    pivot_row, pivot_col = piece.get_pivot_cell() or piece.shape[0]
+    offsets = tuple((row - pivot_row, col - pivot_col) for row, col in piece.shape)
+
+    if piece.pivot_index == -1:
+        return [offsets]
+
+    rotations = []
+    for _ in range(4):
+        rotations.append(offsets)
+        # Rotation in 90 degrees around the pivot cell
+        offsets = tuple((col, -row) for row, col in offsets)
+
+    return rotations
+
+
+def _create_rotation(cells: tuple) -> Rotation:
+    left = min(col for _, col in cells)
+
+    masks = {}
+    for row, col in cells:
+        masks[row] = masks.get(row, 0) | 1 << (col - left)
+
+    return Rotation(cells, left, tuple(sorted(masks.items())))
+
+
+# All the tetrominoes, indexed by PieceType
+PIECES = (
+    #   ##
+    # ######
+    Piece(Color.PURPLE.value, ((0, 1), (1, 0), (1, 1), (1, 2)), 2),
+
+    #     ##
+    # ######
+    Piece(Color.ORANGE.value, ((0, 2), (1, 0), (1, 1), (1, 2)), 2),
+
+    #   ####
+    # ####
+    Piece(Color.GREEN.value, ((0, 1), (0, 2), (1, 0), (1, 1)), 3),
+
+    # ##
+    # ######
+    Piece(Color.BLUE.value, ((0, 0), (1, 0), (1, 1), (1, 2)), 2),
+
+    # ####
+    #   ####
+    Piece(Color.RED.value, ((0, 0), (0, 1), (1, 1), (1, 2)), 2),
+
+    # ####
+    # ####
+    Piece(Color.YELLOW.value, ((0, 0), (0, 1), (1, 0), (1, 1)), -1),
+
+    # ########
+    Piece(Color.CYAN.value, ((0, 0), (0, 1), (0, 2), (0, 3)), 2),
+)
+
+# Every rotation state of every piece, indexed by PieceType and then by
+# the number of rotations of the initial shape
+ROTATIONS = tuple(
+    tuple(_create_rotation(cells) for cells in get_rotation_offsets(piece))
+    for piece in PIECES
+)
+
+# Pieces that take part in the game
+GAME_PIECE_TYPES = (
+    # PieceType.T,
+    # PieceType.L,
+    # PieceType.S,
+    # PieceType.J,
+    # PieceType.Z,
+    PieceType.O,
+    # PieceType.I,
+)
+
+
+@lru_cache(maxsize=None)
+def get_drop_table(piece_type: int, board_width: int) -> dict:
+    """ Gets every final placement of a piece that is dropped straight
+    down from above the board. Rotations that give the same cells as an
+    earlier rotation are skipped. Tables are computed once per piece.
+
+    Args:
+        piece_type (int): Type of the piece.
+        board_width (int): Number of columns of the board.
+
+    Returns:
+        dict: Maps (rotation, column) of the piece, where column is the
+            leftmost column of the piece, to a tuple of its pivot column
+            and the lowest row offset from the pivot in every column it
+            covers.
+    """
+
+    table = {}
+    shapes = set()
+    for rotation, state in enumerate(ROTATIONS[piece_type]):
+        top = min(row for row, _ in state.cells)
+        shape = frozenset((row - top, col - state.left) for row, col in state.cells)
+        if shape in shapes:
+            continue
+        shapes.add(shape)
+
+        piece_width = max(col for _, col in state.cells) - state.left + 1
+        for column in range(board_width - piece_width + 1):
+            pivot_column = column - state.left
+
+            bottoms = {}
+            for row, col in state.cells:
+                col += pivot_column
+                bottoms[col] = max(row, bottoms.get(col, row))
+
+            table[(rotation, column)] = (pivot_column, tuple(bottoms.items()))
+
+    return table
+
+
 def create_game_pieces() -> list[Piece]:
     """Creates game\'s pieces.
-    
-    Parameters
-    ----------
-        colors : dictionary
-            A dictionary of colors - name: color
-    
+
     Returns
     -------
         pieces : list
-            A list of game\'s pieces
+            A list of game\'s pieces, they are shared and mustn't be
+            changed
     """
 
-    pieces = []
-
-    # #   ##
-    # # ######     
-    # shape = [[0, 1], [1, 0], [1, 1], [1, 2]]
-    # pivot_index = 2
-    # pieces.append(Piece(Color.PURPLE.value, shape, pivot_index))
-
-    # #     ##
-    # # ######
-    # shape = [[0, 2], [1, 0], [1, 1], [1, 2]]
-    # pivot_index = 2
-    # pieces.append(Piece(Color.ORANGE.value, shape, pivot_index))
-
-    # #   ####
-    # # ####
-    # shape = [[0, 1], [0, 2], [1, 0], [1, 1]]
-    # pivot_index = 3
-    # pieces.append(Piece(Color.GREEN.value, shape, pivot_index))
-
-    # # ##
-    # # ######
-    # shape = [[0, 0], [1, 0], [1, 1], [1, 2]]
-    # pivot_index = 2
-    # pieces.append(Piece(Color.BLUE.value, shape, pivot_index))
-
-    # # ####
-    # #   ####
-    # shape = [[0, 0], [0, 1], [1, 1], [1, 2]]
-    # pivot_index = 2
-    # pieces.append(Piece(Color.RED.value, shape, pivot_index))
-
-    # ####
-    # ####
-    shape = [[0, 0], [0, 1], [1, 0], [1, 1]]
-    pivot_index = -1
-    pieces.append(Piece(Color.YELLOW.value, shape, pivot_index))
-
-    # # ########
-    # shape = [[0, 0], [0, 1], [0, 2], [0, 3]]
-    # pivot_index = 2
-    # pieces.append(Piece(Color.CYAN.value, shape, pivot_index))
-    
-    return pieces
+    return [PIECES[piece_type] for piece_type in GAME_PIECE_TYPES]
@@ -0,0 +1,139 @@
+import struct
+
+import numpy
+
+# Custom modules
+from main.actions import Action
+
+
+class Recording:
+    """ A recorded game: the seed of its pieces and its actions.
+
+    A game is rebuilt exactly by a `GameManager` with the same seed and
+    gravity interval that takes the same actions. In a file, a fixed
+    header is followed by the actions packed by 2 bits, so a game of
+    10,000 actions takes 2.5 kilobytes.
+    """
+
+    magic = b'TTRS'
+    version = 1
+
+    # Magic, version, gravity interval, seed and number of actions
+    header = struct.Struct('<4sBHQI')
+
+    def __init__(self, seed: int, gravity_interval: int, actions=()):
+        self.seed = seed
+        self.gravity_interval = gravity_interval
+        self.actions = bytearray(actions)
+
+    def __len__(self):
+        return len(self.actions)
+
+    def add(self, action: int):
+        """ Adds an action of the game.
+
+        Args:
+            action (int): In game action value, except exit.
+        """
+
+        if not Action.LEFT.value <= action <= Action.RIGHT.value:
+            raise ValueError(f'Action {action} is not recorded')
+
+        self.actions.append(action)
+
+    def to_bytes(self) -> bytes:
+        """ Packs the recording into its binary format. """
+
+        actions = numpy.frombuffer(self.actions, dtype=numpy.uint8)
+
+        # Pads the actions to whole bytes, 4 actions in every byte with
+        # the first action in the lowest bits
+        actions = numpy.pad(actions, (0, -len(actions) % 4)).reshape(-1, 4)
+        packed = actions[:, 0] | actions[:, 1] << 2 | actions[:, 2] << 4 | actions[:, 3] << 6
+
+        return self.header.pack(self.magic, self.version, self.gravity_interval,
+                                self.seed, len(self.actions)) + packed.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Recording':
+        """ Unpacks a recording from its binary format.
+
+        Raises:
+            ValueError: If the data isn't a recording of this version.
+        """
+
+        if len(data) < cls.header.size:
+            raise ValueError('Recording is too short')
+
+        magic, version, gravity_interval, seed, actions_number = cls.header.unpack_from(data)
+        if magic != cls.magic or version != cls.version:
+            raise ValueError(f'Not a recording of version {cls.version}')
+
+        packed = numpy.frombuffer(data, dtype=numpy.uint8, offset=cls.header.size)
+        if len(packed) * 4 < actions_number:
+            raise ValueError('Recording is truncated')
+
+        actions = numpy.stack([packed >> shift & 3 for shift in (0, 2, 4, 6)], axis=1)
+
+        return cls(seed, gravity_interval, actions.ravel()[:actions_number].tobytes())
+
+    def save(self, file_path: str):
+        """ Writes the recording into a file. """
+
+        with open(file_path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, file_path: str) -> 'Recording':
+        """ Reads a recording from a file. """
+
+        with open(file_path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+
+class Replayer:
+    """ Rebuilds a recorded game action by action.
+
+    Args:
+        recording (Recording): The game to rebuild.
+    """
+
+    def __init__(self, recording: Recording):
+        # Imported here, the game manager records its games with this module
+        from main.game_manager import GameManager
+
+        self.recording = recording
+        self.manager = GameManager(gravity_interval=recording.gravity_interval)
+        self.manager.reset(recording.seed)
+        self.position = 0  # Next action
+        self.score = 0
+        self.game_over = False
+
+    def is_over(self) -> bool:
+        """ Checks whether all the actions were taken. """
+
+        return self.position >= len(self.recording)
+
+    def step(self, actions_number: int = 1) -> tuple:
+        """ Takes the next recorded actions.
+
+        Args:
+            actions_number (int): Number of actions to take.
+
+        Returns:
+            tuple: Board, score and game over state after the actions,
+                same as `GameManager.step`.
+        """
+
+        stop = min(self.position + actions_number, len(self.recording))
+        for action in self.recording.actions[self.position:stop]:
+            _, self.score, self.game_over = self.manager.step(action)
+
+        self.position = stop
+
+        return self.manager.board, self.score, self.game_over
+
+    def run(self) -> tuple:
+        """ Takes all the remaining actions at full speed. """
+
+        return self.step(len(self.recording) - self.position)
@@ -0,0 +1,439 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from main.game_manager import GameManager
+from model.frame_stack import FrameStack
+
+
+class SharedBlock:
+    """ Named arrays laid out in one shared memory block.
+
+    A block is created by one process and attached by its name in the
+    others, which happens when it's passed to a new process.
+    """
+
+    alignment = 64
+
+    def __init__(self, specs: dict, name: str = None):
+        self.specs = specs
+
+        offsets = {}
+        size = 0
+        for array_name, (shape, dtype) in specs.items():
+            offsets[array_name] = size
+            size += int(np.prod(shape)) * np.dtype(dtype).itemsize
+            size = -(-size // self.alignment) * self.alignment
+
+        # Spawned processes share the resource tracker of their parent,
+        # so the block is tracked once and removed by its creator
+        self.memory = shared_memory.SharedMemory(
+            name=name, create=name is None, size=max(size, 1))
+
+        self.arrays = {
+            array_name: np.ndarray(shape, dtype, self.memory.buf, offsets[array_name])
+            for array_name, (shape, dtype) in specs.items()
+        }
+
+    def __reduce__(self):
+        return SharedBlock, (self.specs, self.memory.name)
+
+    def close(self):
+        """ Detaches the block from the process. """
+
+        self.arrays = {}
+        self.memory.close()
+
+    def unlink(self):
+        """ Detaches the block and removes it, done by its creator. """
+
+        self.close()
+        self.memory.unlink()
+
+
+class TransitionQueue:
+    """ A shared ring of transitions of a single game, played in an actor
+    process, to the learner process.
+
+    Every entry is a frame with the action, reward and game over flag
+    that led to it, or the initial frame of a new game. The actor only
+    moves the written counter and the learner only moves the read one,
+    so no lock is needed. The actor waits while the ring is full.
+    """
+
+    def __init__(self, capacity: int, height: int, width: int, block: SharedBlock = None):
+        self.capacity = capacity
+        self.block = block or SharedBlock({
+            'frames': ((capacity, height, width), np.uint8),
+            'actions': ((capacity,), np.uint8),
+            'rewards': ((capacity,), np.float32),
+            'game_overs': ((capacity,), bool),
+            'starts': ((capacity,), bool),
+            'counters': ((2,), np.int64),  # Written and read entries
+        })
+
+        arrays = self.block.arrays
+        self.frames = arrays['frames']
+        self.actions = arrays['actions']
+        self.rewards = arrays['rewards']
+        self.game_overs = arrays['game_overs']
+        self.starts = arrays['starts']
+        self.counters = arrays['counters']
+
+    def __reduce__(self):
+        return TransitionQueue, (self.capacity, 0, 0, self.block)
+
+    def _put(self, frame: np.ndarray, action: int, reward: float,
+             game_over: bool, start: bool):
+        written = self.counters[0]
+        while written - self.counters[1] >= self.capacity:
+            time.sleep(0.001)  # Waits for the learner
+
+        slot = written % self.capacity
+        self.frames[slot] = frame
+        self.actions[slot] = action
+        self.rewards[slot] = reward
+        self.game_overs[slot] = game_over
+        self.starts[slot] = start
+
+        # The entry is visible to the learner only after it's written
+        self.counters[0] = written + 1
+
+    def put_start(self, frame: np.ndarray):
+        """ Adds the initial board of a new game.
+
+        Args:
+            frame (np.ndarray): Game's board.
+        """
+
+        self._put(frame, 0, 0, False, True)
+
+    def put(self, action: int, reward: float, frame: np.ndarray, game_over: bool):
+        """ Adds a transition of the current game.
+
+        Args:
+            action (int): Action that was taken.
+            reward (float): Reward of the action.
+            frame (np.ndarray): Game's board after the action.
+            game_over (bool): Game's state.
+        """
+
+        self._put(frame, action, reward, game_over, False)
+
+    def get_pending_game_overs(self) -> np.ndarray:
+        """ Gets game over flags of the written entries that weren't read
+        yet, oldest first, without copying the entries. The flags are a
+        view of the ring, unless the entries wrap around its end.
+        """
+
+        read, written = self.counters[1], self.counters[0]
+        start = read % self.capacity
+        stop = start + written - read
+        if stop <= self.capacity:
+            return self.game_overs[start:stop]
+
+        return np.concatenate([self.game_overs[start:],
+                               self.game_overs[:stop - self.capacity]])
+
+    def get_pending(self, count: int) -> tuple:
+        """ Gets the oldest written entries that weren't read yet.
+
+        Args:
+            count (int): Number of the entries, at most the number of
+                pending entries.
+
+        Returns:
+            tuple: Copies of the frames, actions, rewards, game over
+                flags and start flags of the entries, oldest first.
+        """
+
+        read = self.counters[1]
+        slots = np.arange(read, read + count) % self.capacity
+
+        return (self.frames[slots], self.actions[slots], self.rewards[slots],
+                self.game_overs[slots], self.starts[slots])
+
+    def release(self, count: int):
+        """ Frees the oldest pending entries for the actor.
+
+        Args:
+            count (int): Number of the entries that were read.
+        """
+
+        self.counters[1] += count
+
+
+class SharedWeights:
+    """ Model's weights published by the learner to the actors.
+
+    The version is odd while the weights are written, so an actor never
+    loads weights that are half written.
+    """
+
+    def __init__(self, shapes: list, block: SharedBlock = None):
+        self.shapes = shapes
+        self.sizes = [int(np.prod(shape)) for shape in shapes]
+        self.block = block or SharedBlock({
+            'weights': ((sum(self.sizes),), np.float32),
+            'version': ((1,), np.int64),
+        })
+
+        self.weights = self.block.arrays['weights']
+        self.version = self.block.arrays['version']
+
+    def __reduce__(self):
+        return SharedWeights, (self.shapes, self.block)
+
+    def publish(self, weights: list):
+        """ Writes new weights and increases the version.
+
+        Args:
+            weights (list): Weights of the model, as `get_weights` gives.
+        """
+
+        version = self.version[0] + 1
+        self.version[0] = version
+
+        start = 0
+        for weight, size in zip(weights, self.sizes):
+            self.weights[start:start + size] = weight.ravel()
+            start += size
+
+        self.version[0] = version + 1
+
+    def load(self, model, version: int) -> int:
+        """ Sets the published weights to a model if they are newer.
+
+        Args:
+            model: Model with the learner's model architecture.
+            version (int): Version of the model's weights.
+
+        Returns:
+            int: Version of the model's weights after loading.
+        """
+
+        published_version = self.version[0]
+        if published_version == version or published_version % 2:
+            return version
+
+        weights = []
+        start = 0
+        for shape, size in zip(self.shapes, self.sizes):
+            weights.append(self.weights[start:start + size].reshape(shape).copy())
+            start += size
+
+        if self.version[0] != published_version:
+            return version  # Changed while copying, loaded next time
+
+        model.set_weights(weights)
+
+        return published_version
+
+
+def start_games(envs: list, frame_stacks: list, queues: list):
+    """ Adds the initial boards of games to their queues.
+
+    Args:
+        envs (list): Game managers of the games.
+        frame_stacks (list): Last frames of every game.
+        queues (list): Transition queue of every game.
+    """
+
+    for env, frame_stack, queue in zip(envs, frame_stacks, queues):
+        frame_stack.reset(env.board)
+        queue.put_start(env.board)
+
+
+def step_games(envs: list, frame_stacks: list, queues: list, actions: np.ndarray):
+    """ Takes an action in every game and adds the transitions to the
+    game's own queue. Games that are over start again.
+
+    Args:
+        envs (list): Game managers of the games.
+        frame_stacks (list): Last frames of every game.
+        queues (list): Transition queue of every game.
+        actions (np.ndarray): Action of every game.
+    """
+
+    for env, frame_stack, queue, action in zip(envs, frame_stacks, queues, actions):
+        frame, reward, game_over = env.step(int(action))
+        queue.put(action, reward, frame, game_over)
+
+        if game_over:
+            env.reset()
+            frame_stack.reset(env.board)
+            queue.put_start(env.board)
+        else:
+            frame_stack.push(frame)
+
+
+def run_actor(queues: list, weights: SharedWeights, epsilon, stop_event,
+              input_shape: tuple):
+    """ Plays headless games with the latest published weights and adds
+    their transitions to their queues. Actions of all the games are
+    selected with one forward pass.
+
+    Args:
+        queues (list): Transition queue of every game of the actor.
+        weights (SharedWeights): Weights published by the learner.
+        epsilon: Shared exploration rate.
+        stop_event: Stops the actor when it's set.
+        input_shape (tuple): Model's input shape, (height, width, frames).
+    """
+
+    from model.brain import Brain  # Loads TensorFlow in the actor process
+
+    height, width, frames_number = input_shape
+    model = Brain(input_shape).create_model()
+    version = 0
+
+    games_number = len(queues)
+    envs = [GameManager() for _ in range(games_number)]
+    frame_stacks = [FrameStack(height, width, frames_number) for _ in range(games_number)]
+    states = np.empty((games_number, height, width, frames_number), dtype=np.uint8)
+    start_games(envs, frame_stacks, queues)
+
+    while not stop_event.is_set():
+        version = weights.load(model, version)
+
+        # Select actions
+        actions = np.random.randint(0, 4, size=games_number)
+        exploitation = np.random.rand(games_number) > epsilon.value
+        if version and exploitation.any():
+            for index, frame_stack in enumerate(frame_stacks):
+                frame_stack.copy_to(states[index])
+
+            q_values = model.predict(states[exploitation], verbose=0)
+            actions[exploitation] = np.argmax(q_values, axis=1)
+
+        # Update the environments
+        step_games(envs, frame_stacks, queues, actions)
+
+
+class ActorPool:
+    """ Actor processes that play games and the learner's side of their
+    transition queues.
+
+    Every game of an actor has its own queue, and games are remembered
+    one after another, as the replay memory rebuilds states from
+    neighbour frames. Only whole games are taken from a queue, unless
+    it's half full with a single game, which then continues as a new
+    game from its last frame.
+    """
+
+    def __init__(self, actors_number: int, games_number: int, input_shape: tuple,
+                 epsilon: float, queue_capacity: int = 4096):
+        self.actors_number = actors_number
+        self.games_number = games_number
+        self.input_shape = input_shape
+        self.queue_capacity = queue_capacity
+
+        # Processes are spawned, as forking a process that runs
+        # TensorFlow isn't safe
+        self.context = multiprocessing.get_context('spawn')
+        self.epsilon = self.context.Value('d', epsilon, lock=False)
+        self.stop_event = self.context.Event()
+
+        self.queues = []
+        self.weights = None
+        self.processes = []
+
+        # Last frame of the current game of every queue and the queue
+        # whose game was remembered last
+        self.last_frames = {}
+        self.last_queue = None
+
+    def start(self, model):
+        """ Publishes model's weights and starts the actors.
+
+        Args:
+            model: Trained model.
+        """
+
+        height, width, _ = self.input_shape
+        model_weights = model.get_weights()
+        self.weights = SharedWeights([weight.shape for weight in model_weights])
+        self.weights.publish(model_weights)
+
+        for _ in range(self.actors_number):
+            queues = [TransitionQueue(self.queue_capacity, height, width)
+                      for _ in range(self.games_number)]
+            process = self.context.Process(
+                target=run_actor, daemon=True,
+                args=(queues, self.weights, self.epsilon, self.stop_event,
+                      self.input_shape))
+            process.start()
+
+            self.queues.extend(queues)
+            self.processes.append(process)
+
+    def publish(self, model):
+        """ Publishes model's weights to the actors. """
+
+        self.weights.publish(model.get_weights())
+
+    def set_epsilon(self, epsilon: float):
+        """ Sets the exploration rate of the actors. """
+
+        self.epsilon.value = epsilon
+
+    def drain(self, dqn) -> list:
+        """ Remembers transitions of the actors.
+
+        Args:
+            dqn (DQN): DQN that remembers the transitions.
+
+        Returns:
+            list: Last rewards of the games that are over.
+        """
+
+        scores = []
+        for index, queue in enumerate(self.queues):
+            # Entries are copied only when they are taken
+            pending_game_overs = queue.get_pending_game_overs()
+            game_over_indices = np.flatnonzero(pending_game_overs)
+            if len(game_over_indices):
+                count = game_over_indices[-1] + 1
+            elif len(pending_game_overs) >= self.queue_capacity // 2:
+                count = len(pending_game_overs)
+            else:
+                continue
+
+            frames, actions, rewards, game_overs, starts = queue.get_pending(count)
+
+            # A game that continues from an earlier drain, after games of
+            # other queues were remembered
+            if not starts[0] and self.last_queue != index:
+                dqn.start_game(self.last_frames[index])
+
+            for entry in range(count):
+                if starts[entry]:
+                    dqn.start_game(frames[entry])
+                else:
+                    dqn.add(actions[entry], rewards[entry], frames[entry], game_overs[entry])
+
+            scores.extend(rewards[game_over_indices].tolist())
+            self.last_frames[index] = frames[count - 1]
+            self.last_queue = index
+            queue.release(count)
+
+        return scores
+
+    def stop(self):
+        """ Stops the actors and removes the shared memory. """
+
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+        for queue in self.queues:
+            queue.block.unlink()
+        if self.weights is not None:
+            self.weights.block.unlink()
+
+        self.queues = []
+        self.processes = []
@@ -0,0 +1,84 @@
+import queue
+import threading
+
+
+class BatchPrefetcher:
+    """ Samples the next training batches in a background thread.
+
+    The worker keeps up to `batches_number` batches of sampled
+    experiences in a bounded queue and blocks while it's full, so it
+    runs ahead of the training by that many batches at most. Sampling
+    and rebuilding the states overlap with the training step, while the
+    targets are predicted with the current model when a batch is taken.
+
+    With 0 batches nothing is prefetched and every batch is sampled when
+    it's taken, same as `DQN.get_batch`.
+    """
+
+    def __init__(self, dqn, batch_size: int, batches_number: int = 2):
+        self.dqn = dqn
+        self.batch_size = batch_size
+        self.batches_number = batches_number
+
+        self.batches = queue.Queue(maxsize=max(batches_number, 1))
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        if batches_number:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _put(self, item) -> bool:
+        # Waits for a free place, until the prefetcher is closed
+        while not self.stop_event.is_set():
+            try:
+                self.batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def _run(self):
+        try:
+            while not self.stop_event.is_set():
+                # Nothing can be sampled until the first experience
+                if len(self.dqn.memory) == 0:
+                    self.stop_event.wait(0.001)
+                    continue
+
+                if not self._put(self.dqn.sample(self.batch_size)):
+                    break
+        except Exception as error:
+            self._put(error)
+
+    def get_batch(self, model) -> tuple:
+        """ Takes the next sampled batch and predicts its targets.
+
+        Args:
+            model: Trained model.
+
+        Returns:
+            tuple: Inputs, targets and importance-sampling weights, same
+                as `DQN.get_batch`.
+
+        Raises:
+            Exception: The error of sampling the batch.
+        """
+
+        if self.thread is None:
+            return self.dqn.get_batch(model, self.batch_size)
+
+        samples = self.batches.get()
+        if isinstance(samples, Exception):
+            raise samples
+
+        return self.dqn.get_batch(model, self.batch_size, samples)
+
+    def close(self):
+        """ Stops the worker thread. """
+
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -1,14 +1,29 @@
-from keras.models import Sequential, load_model
-from keras.layers import Conv2D, MaxPooling2D, Flatten, Dense
-from keras.optimizers import Adam
+from keras import optimizers
+from keras.models import Sequential, clone_model, load_model
+from keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Input, Rescaling
+from keras.optimizers import Adam, LossScaleOptimizer
 
 
 class Brain:
     """ Resembles model's brain. """
-    def __init__(self, input_shape, learning_rate=0.005):
+    def __init__(self, input_shape, learning_rate=0.005, mixed_precision=False):
         self.input_shape = input_shape
         self.learning_rate = learning_rate
         self.outputs_number = 4   
+        
+        # Mixed precision computes in float16 and keeps the weights in
+        # float32. It applies to created models, a loaded model keeps its
+        # own policy.
+        self.dtype_policy = 'mixed_float16' if mixed_precision else 'float32'
+    
+    def _create_optimizer(self):
+        optimizer = Adam(learning_rate=self.learning_rate)
+        
+        # Scales the loss, so small gradients don't underflow in float16
+        if self.dtype_policy == 'mixed_float16':
+            optimizer = LossScaleOptimizer(optimizer)
+        
+        return optimizer
     
     def create_model(self):
         """ Creates a sequential CNN model. """
@@ -21,18 +36,24 @@ class Brain:
         #
         # Here 32 neurons are 32 filters to extract features. (3, 3) means
         # the size of filters.
+        #
+        # States are boards of 0/1 cells, which are fed as uint8 and cast
+        # to the compute dtype by the model itself.
+        model.add(Input(shape=self.input_shape, dtype='uint8'))
+        model.add(Rescaling(1.0, dtype=self.dtype_policy))
         model.add(Conv2D(32, (3, 3), activation='relu',
-                              input_shape=self.input_shape))  # Input layer
-        model.add(MaxPooling2D((2, 2)))
-        model.add(Conv2D(64, (2, 2), activation='relu'))
+                         dtype=self.dtype_policy))  # Input layer
+        model.add(MaxPooling2D((2, 2), dtype=self.dtype_policy))
+        model.add(Conv2D(64, (2, 2), activation='relu', dtype=self.dtype_policy))
         
-        model.add(Flatten())  # Needed to connect CNN and ANN
+        model.add(Flatten(dtype=self.dtype_policy))  # Needed to connect CNN and ANN
         
-        # Fully connected neural network, ANN part
-        model.add(Dense(256, activation='relu'))
-        model.add(Dense(self.outputs_number))  # Output layer
+        # Fully connected neural network, ANN part. Q-values are float32
+        # with any policy.
+        model.add(Dense(256, activation='relu', dtype=self.dtype_policy))
+        model.add(Dense(self.outputs_number, dtype='float32'))  # Output layer
         
-        model.compile(optimizer=Adam(learning_rate=self.learning_rate), loss='mse')
+        model.compile(optimizer=self._create_optimizer(), loss='mse')
         
         return model
         
@@ -40,3 +61,26 @@ class Brain:
         """ Loads model from a given file path."""
         
         return load_model(file_path)
+    
+    def create_target_model(self, model):
+        """ Creates a frozen copy of a model, used to compute training
+        targets. It's never trained, only synchronized with the model.
+        """
+        
+        target_model = clone_model(model)
+        target_model.set_weights(model.get_weights())
+        
+        return target_model
+    
+    def create_checkpoint_model(self, model):
+        """ Creates a compiled copy of a model, which takes snapshots of
+        the model's weights and is saved while the model keeps training.
+        """
+        
+        # Same optimizer as the model's, so its state can be copied
+        optimizer = optimizers.deserialize(optimizers.serialize(model.optimizer))
+        
+        checkpoint_model = clone_model(model)
+        checkpoint_model.compile(optimizer=optimizer, loss='mse')
+        
+        return checkpoint_model
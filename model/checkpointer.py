@@ -0,0 +1,162 @@
+import os
+import pickle
+import shutil
+import threading
+import time
+
+from model.numpy_model import export_weights
+
+
+class Checkpointer:
+    """ Saves training checkpoints in a background thread.
+
+    A checkpoint is taken every `epochs_interval` epochs or every
+    `seconds_interval` seconds, whichever comes first. Taking it only
+    copies the model's weights, the optimizer's state and the training
+    progress. A thread then sets them to a copy of the model, saves it
+    into a new checkpoint directory and flushes the replay memory, while
+    the training goes on.
+
+    Every file is first written under a temporary name and then renamed.
+    The latest checkpoint is also copied to the model, weights and
+    progress paths the training resumes from, and only the last `keep`
+    checkpoint directories are retained.
+    """
+
+    model_file_name = 'model.keras'
+    weights_file_name = 'model.npz'
+    progress_file_name = 'model_progress'
+
+    def __init__(self, checkpoint_model, model_file_path: str, weights_file_path: str,
+                 progress_file_path: str, directory: str = 'checkpoints',
+                 epochs_interval: int = 1, seconds_interval: float = None, keep: int = 3):
+        self.checkpoint_model = checkpoint_model  # Compiled copy of the model
+        self.model_file_path = model_file_path
+        self.weights_file_path = weights_file_path
+        self.progress_file_path = progress_file_path
+        self.directory = directory
+        self.epochs_interval = epochs_interval
+        self.seconds_interval = seconds_interval
+        self.keep = keep
+
+        self.last_epochs_number = None
+        self.last_time = time.monotonic()
+        self.thread = None
+        self.error = None
+
+    def is_due(self, epochs_number: int) -> bool:
+        """ Checks whether a checkpoint should be taken at an epoch. """
+
+        if self.last_epochs_number is None:
+            self.last_epochs_number = epochs_number - 1
+
+        if self.epochs_interval and epochs_number - self.last_epochs_number >= self.epochs_interval:
+            return True
+
+        return bool(self.seconds_interval
+                    and time.monotonic() - self.last_time >= self.seconds_interval)
+
+    def save(self, model, dqn, epsilon: float, epochs_number: int):
+        """ Takes a checkpoint and saves it in the background. Waits for
+        the previous checkpoint if it's still being saved.
+
+        Args:
+            model: Trained model.
+            dqn (DQN): DQN with the replay memory.
+            epsilon (float): Exploration rate.
+            epochs_number (int): Number of trained epochs.
+        """
+
+        self.wait()
+
+        snapshot = {
+            'weights': model.get_weights(),
+            'optimizer': [variable.numpy() for variable in model.optimizer.variables],
+            'memory': dqn.memory.get_metadata(),
+            'progress': [epsilon, epochs_number],
+        }
+
+        self.last_epochs_number = epochs_number
+        self.last_time = time.monotonic()
+        self.thread = threading.Thread(target=self._write, args=(dqn.memory, snapshot))
+        self.thread.start()
+
+    def save_if_due(self, model, dqn, epsilon: float, epochs_number: int) -> bool:
+        """ Takes a checkpoint if it's due, same as `save`.
+
+        Returns:
+            bool: Whether a checkpoint was taken.
+        """
+
+        if not self.is_due(epochs_number):
+            return False
+
+        self.save(model, dqn, epsilon, epochs_number)
+
+        return True
+
+    def wait(self):
+        """ Waits until the last checkpoint is saved.
+
+        Raises:
+            Exception: The error of saving the last checkpoint.
+        """
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _set_optimizer_state(self, variables: list):
+        optimizer = self.checkpoint_model.optimizer
+        if not optimizer.built:
+            optimizer.build(self.checkpoint_model.trainable_variables)
+
+        # Optimizer's state isn't kept if its variables don't match
+        if len(optimizer.variables) != len(variables):
+            return
+
+        for variable, value in zip(optimizer.variables, variables):
+            variable.assign(value)
+
+    def _write(self, memory, snapshot: dict):
+        try:
+            self.checkpoint_model.set_weights(snapshot['weights'])
+            self._set_optimizer_state(snapshot['optimizer'])
+
+            epochs_number = snapshot['progress'][1]
+            checkpoint_path = os.path.join(self.directory, f'epoch_{epochs_number:08d}')
+            temp_path = f'{checkpoint_path}.temp'
+            shutil.rmtree(temp_path, ignore_errors=True)
+            os.makedirs(temp_path)
+
+            self.checkpoint_model.save(os.path.join(temp_path, self.model_file_name))
+            export_weights(self.checkpoint_model, os.path.join(temp_path, self.weights_file_name))
+            with open(os.path.join(temp_path, self.progress_file_name), 'wb') as file:
+                pickle.dump(snapshot['progress'], file)
+
+            shutil.rmtree(checkpoint_path, ignore_errors=True)
+            os.replace(temp_path, checkpoint_path)
+
+            memory.flush(snapshot['memory'])  # Writes only the new experiences
+
+            # The training resumes from the latest checkpoint
+            for file_name, file_path in ((self.model_file_name, self.model_file_path),
+                                         (self.weights_file_name, self.weights_file_path),
+                                         (self.progress_file_name, self.progress_file_path)):
+                shutil.copyfile(os.path.join(checkpoint_path, file_name), f'{file_path}.temp')
+                os.replace(f'{file_path}.temp', file_path)
+
+            self._remove_old_checkpoints()
+        except Exception as error:
+            self.error = error
+
+    def _remove_old_checkpoints(self):
+        checkpoints = sorted(name for name in os.listdir(self.directory)
+                             if name.startswith('epoch_') and not name.endswith('.temp'))
+
+        for name in checkpoints[:-self.keep]:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
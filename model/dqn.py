@@ -1,13 +1,56 @@
+import threading
+
 import numpy as np
 
+from model.replay_memory import ReplayMemory
+from model.sum_tree import SumTree
+
 
 class DQN:
-    def __init__(self, max_memory, gamma):
+    def __init__(self, max_memory, gamma, frames_number=4, memory_path=None,
+                 prioritized=False, alpha=0.6, beta=0.4, beta_increment=0.00001):
         self.max_memory = max_memory
         self.gamma = gamma
         
-        # Experiences (state, action, reward, next_state, game_over)
-        self.memory = []
+        # Experiences (state, action, reward, next_state, game_over),
+        # stored one frame per experience. With a memory path they are
+        # kept in memory-mapped files in that directory.
+        self.memory = ReplayMemory(max_memory, frames_number, memory_path)
+        
+        # Prioritized experience replay: experiences are sampled in
+        # proportion to their TD error to the power of alpha, and beta
+        # grows to 1 to correct the bias with importance-sampling weights
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.priority_epsilon = 0.001  # Keeps every experience sampleable
+        self.max_priority = 1.0
+        self.priorities = None
+        
+        # Target network, synchronized with the trained model every
+        # target update interval updates. Its max Q-values of next states
+        # are cached per memory slot until the next synchronization.
+        self.target_model = None
+        self.target_update_interval = 0
+        self.updates = 0
+        self.target_q_values = np.full(max_memory, np.nan, dtype=np.float32)
+        
+        # Experiences can be sampled in another thread while new ones are
+        # remembered. The lock guards the memory and the priorities, and
+        # the number of written frames tells which sampled slots were
+        # overwritten before their batch was trained on.
+        self.lock = threading.Lock()
+        self.written = 0
+        
+        if prioritized:
+            self.priorities = SumTree(max_memory)
+            
+            # Priorities aren't stored, loaded experiences start with
+            # the highest priority
+            slots = np.flatnonzero(self.memory.steps[:self.memory.size])
+            if len(slots):
+                self.priorities.update(slots, self.max_priority)
     
     def remember(self, transition, game_over):
         """ Remembers new experience.
@@ -17,45 +60,190 @@ class DQN:
             game_over: Game's state.
         """
         
-        self.memory.append([transition, game_over])
-        if len(self.memory) > self.max_memory:
-            del self.memory[0]  # Oldest experience
-    
-    def get_batch(self, model, batch_size):
-        """ Get batches of input/output. Training data. """
-        
-        outputs_number = model.output_shape[-1]
-        min_batch_size = min(batch_size, len(self.memory))
-        
-        # Initialization of input/targets
-        # Exploration
-        #
-        # First experience -> transition -> state -> shape's height
-        # shape[1] - because Keras input is always a column
-        state_height = self.memory[0][0][0].shape[1]
-        state_width = self.memory[0][0][0].shape[2]
-        frames_number = self.memory[0][0][0].shape[3]  # For convolution network
-        inputs = np.zeros((
-            min_batch_size, state_height, state_width, frames_number
-        ))
-        
-        targets = np.zeros((min_batch_size, outputs_number))
-        
-        # Extract experience randomly
-        for i, t_index in enumerate(np.random.randint(
-                0, len(self.memory), size=min_batch_size)):
-            current_state, action, reward, next_state = self.memory[t_index][0]
-            game_over = self.memory[t_index][1]
+        current_state, action, reward, next_state = transition
+        
+        # States hold the newest frame last. A state that doesn't follow
+        # the last remembered frame starts a new game.
+        frame = current_state[0, :, :, -1]
+        if not self.memory.is_last_frame(frame):
+            self.start_game(frame)
+        
+        self.add(action, reward, next_state[0, :, :, -1], game_over)
+    
+    def start_game(self, frame):
+        """ Remembers the initial board of a new game.
+
+        Args:
+            frame: Game's board.
+        """
+        
+        self.target_q_values[self.memory.cursor] = np.nan
+        with self.lock:
+            if self.prioritized:
+                self.priorities.update([self.memory.cursor], 0)
             
-            # Update inputs and targets
-            inputs[i] = current_state
-            targets[i] = model.predict(current_state, verbose=0)[0]  # Picks the highest probability
+            self.memory.start_game(frame)
+            self.written += 1
+    
+    def add(self, action, reward, frame, game_over):
+        """ Remembers new experience of the current game by its newest
+        frame only.
+
+        Args:
+            action: Action that was taken.
+            reward: Reward of the action.
+            frame: Game's board after the action.
+            game_over: Game's state.
+        """
+        
+        self.target_q_values[self.memory.cursor] = np.nan
+        with self.lock:
+            if self.prioritized:
+                # New experiences are sampled at least once
+                self.priorities.update([self.memory.cursor], self.max_priority ** self.alpha)
             
-            # Q-Learning update rule
-            if game_over:
-                targets[i][action] = reward
+            self.memory.add(action, reward, frame, game_over)
+            self.written += 1
+    
+    def set_target_model(self, target_model, update_interval):
+        """ Sets a target network to compute training targets with.
+
+        Args:
+            target_model: A copy of the trained model.
+            update_interval: Number of updates between synchronizations
+                of the target network with the trained model.
+        """
+        
+        self.target_model = target_model
+        self.target_update_interval = update_interval
+        self.target_q_values[:] = np.nan
+    
+    def _sync_target_model(self, model):
+        self.target_model.set_weights(model.get_weights())
+        self.target_q_values[:] = np.nan
+    
+    def _get_target_q_values(self, model, slots, next_states, game_overs, fresh):
+        self.updates += 1
+        if self.updates % self.target_update_interval == 0:
+            self._sync_target_model(model)
+        
+        # Next states of game over experiences aren't used. Cached values
+        # of overwritten slots belong to their new experiences.
+        q_values = np.where(fresh, self.target_q_values[slots], np.nan)
+        missing = np.isnan(q_values) & ~game_overs
+        if missing.any():
+            q_values[missing] = np.max(self.target_model.predict(
+                next_states[missing], verbose=0), axis=1)
+            self.target_q_values[slots[missing & fresh]] = q_values[missing & fresh]
+        
+        return np.nan_to_num(q_values)
+    
+    def _sample_prioritized(self, batch_size):
+        # One sample from every equal segment of the priorities sum
+        segment = self.priorities.total / batch_size
+        values = (np.arange(batch_size) + np.random.rand(batch_size)) * segment
+        slots = self.priorities.find(values)
+        
+        invalid = ~self.memory.is_sampleable(slots) | (self.priorities.get(slots) == 0)
+        while invalid.any():
+            # Slots that lost their previous frames are never sampled again
+            lost_slots = slots[invalid & (self.priorities.get(slots) > 0)]
+            if len(lost_slots):
+                self.priorities.update(lost_slots, 0)
+            
+            slots[invalid] = self.priorities.find(
+                np.random.rand(invalid.sum()) * self.priorities.total)
+            invalid = ~self.memory.is_sampleable(slots) | (self.priorities.get(slots) == 0)
+        
+        probabilities = self.priorities.get(slots) / self.priorities.total
+        weights = (len(self.memory) * probabilities) ** -self.beta
+        weights /= weights.max()
+        self.beta = min(1.0, self.beta + self.beta_increment)
+        
+        return slots, weights
+    
+    def sample(self, batch_size):
+        """ Samples experiences of a training batch. Can be called from
+        another thread while new experiences are remembered.
+        
+        Returns:
+            Slots, importance-sampling weights and transitions of the
+            experiences, and the number of frames written before they
+            were sampled. Weights are all 1 without prioritized replay.
+        """
+        
+        with self.lock:
+            min_batch_size = min(batch_size, len(self.memory))
+            
+            # Extract experience randomly
+            if self.prioritized:
+                slots, weights = self._sample_prioritized(min_batch_size)
+                experiences = self.memory.get_transitions(slots)
             else:
-                targets[i][action] = (reward + self.gamma
-                                      * np.max(model.predict(next_state, verbose=0)[0]))
+                slots, experiences = self.memory.sample(min_batch_size)
+                weights = np.ones(min_batch_size)
+            
+            return slots, weights, experiences, self.written
+    
+    def _get_fresh_slots(self, slots, written):
+        # Slots that weren't overwritten by the frames written since they
+        # were sampled
+        new_frames = self.written - written
+        first_new_slot = (self.memory.cursor - new_frames) % self.max_memory
+        
+        return (slots - first_new_slot) % self.max_memory >= new_frames
+    
+    def get_batch(self, model, batch_size, samples=None):
+        """ Get batches of input/output. Training data.
+        
+        Args:
+            model: Trained model, which predicts the targets.
+            batch_size: Number of experiences.
+            samples: Experiences sampled earlier with `sample`. New
+                experiences are sampled by default.
+        
+        Returns:
+            Inputs, targets and importance-sampling weights of the
+            experiences. Weights are all 1 without prioritized replay.
+        """
+        
+        if samples is None:
+            samples = self.sample(batch_size)
+        
+        slots, weights, experiences, written = samples
+        fresh = self._get_fresh_slots(slots, written)
+        
+        # Experiences that were all overwritten since they were sampled
+        # aren't trained on, new ones are sampled instead
+        if len(slots) and not fresh.any():
+            slots, weights, experiences, written = self.sample(batch_size)
+            fresh = self._get_fresh_slots(slots, written)
+        
+        # States stay uint8, the model casts them itself
+        current_states, actions, rewards, next_states, game_overs = experiences
+        
+        # One forward pass for all the current states and one for all the
+        # next states, which are mostly cached with a target network
+        targets = model.predict(current_states, verbose=0)
+        if self.target_model is not None:
+            next_q_values = self._get_target_q_values(
+                model, slots, next_states, game_overs, fresh)
+        else:
+            next_q_values = np.max(
+                model.predict(next_states, verbose=0), axis=1)
+        
+        # Q-Learning update rule
+        batch_indices = np.arange(len(slots))
+        new_q_values = np.where(game_overs, rewards, rewards + self.gamma * next_q_values)
+        
+        if self.prioritized:
+            priorities = np.abs(new_q_values - targets[batch_indices, actions])
+            priorities += self.priority_epsilon
+            self.max_priority = max(self.max_priority, priorities.max())
+            if fresh.any():
+                with self.lock:
+                    self.priorities.update(slots[fresh], priorities[fresh] ** self.alpha)
+        
+        targets[batch_indices, actions] = new_q_values
             
-        return inputs, targets
+        return current_states, targets, weights
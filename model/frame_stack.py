@@ -0,0 +1,75 @@
+import numpy as np
+
+
+class FrameStack:
+    """ Keeps the last boards of a game as a model's input state.
+
+    Frames are kept in `frames_number + 1` circular slots, stored twice
+    along the last axis, so the ordered window of the last
+    `frames_number` frames is always a view of it. A pushed frame takes
+    the slot that isn't in the current window, so the previous state
+    stays valid until the next push. Pushing a frame writes at most two
+    slices and allocates nothing.
+
+    Frames keep only the occupancy of the board's cells, 1 for a filled
+    cell and 0 for an empty one, same as the replay memory. They are
+    uint8 by default, the model casts them itself.
+    """
+
+    def __init__(self, height: int, width: int, frames_number: int = 4,
+                 dtype=np.uint8):
+        self.frames_number = frames_number
+        self.slots_number = frames_number + 1
+        self.frames = np.zeros((1, height, width, 2 * frames_number), dtype=dtype)
+        self.position = 0  # Slot of the oldest frame
+
+        # Ordered window for every position, from the oldest frame to the
+        # newest one
+        self.states = [self.frames[..., position:position + frames_number]
+                       for position in range(self.slots_number)]
+
+    def reset(self, frame: np.ndarray):
+        """ Fills the stack with the first frame of a game.
+
+        Args:
+            frame (np.ndarray): Game's board.
+        """
+
+        self.frames[0] = frame[:, :, None] != 0
+        self.position = 0
+
+    def push(self, frame: np.ndarray):
+        """ Adds the newest frame, the oldest one leaves the state.
+
+        Args:
+            frame (np.ndarray): Game's board.
+        """
+
+        # The slot after the newest frame, the only one out of the window
+        slot = (self.position + self.frames_number) % self.slots_number
+        cells = frame != 0
+        self.frames[0, :, :, slot] = cells
+        if slot + self.slots_number < self.frames.shape[-1]:
+            self.frames[0, :, :, slot + self.slots_number] = cells
+        self.position = (self.position + 1) % self.slots_number
+
+    def get_state(self) -> np.ndarray:
+        """ Gets the state of the last frames.
+
+        Returns:
+            np.ndarray: A (1, height, width, frames) view, from the oldest
+                frame to the newest one. It stays valid after the next
+                push and is overwritten by the push after it.
+        """
+
+        return self.states[self.position]
+
+    def copy_to(self, state: np.ndarray):
+        """ Writes the state of the last frames into a given array, e.g.
+        a slot of a batch.
+
+        Args:
+            state (np.ndarray): A (height, width, frames) array.
+        """
+
+        np.copyto(state, self.states[self.position][0])
@@ -0,0 +1,185 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class InferenceService:
+    """ Merges states of many environments into batches for one model.
+
+    Every caller submits a single state and waits for its Q-values. A
+    worker thread takes the first waiting state and collects more for up
+    to `max_wait` seconds, until the batch is full or every known client
+    is waiting, then runs one forward pass for the whole batch.
+
+    All the states must have the shape of the first submitted state. An
+    error of a batch is set to the futures of all its states.
+
+    Sizes of the batches and the time every state waited for its forward
+    pass are kept for `get_stats`.
+    """
+
+    def __init__(self, model, max_batch_size: int = 64, max_wait: float = 0.002,
+                 clients_number: int = None, stats_size: int = 10_000):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        # A batch doesn't wait for more states than there are clients
+        self.clients_number = clients_number or max_batch_size
+
+        self.requests = queue.Queue()
+        self.states = None  # Batch buffer, allocated with the first state
+        self.state_shape = None  # Shape of the first state
+        self.closed = False
+        self.submit_lock = threading.Lock()
+
+        self.stats_lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.queue_times = deque(maxlen=stats_size)
+        self.requests_number = 0
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, state: np.ndarray) -> Future:
+        """ Adds a state to the next batch.
+
+        Args:
+            state (np.ndarray): A (1, height, width, frames) state.
+
+        Returns:
+            Future: Q-values of the state.
+
+        Raises:
+            ValueError: If the state's shape differs from the first state.
+            RuntimeError: If the service is closed.
+        """
+
+        state = np.asarray(state)
+        future = Future()
+        with self.submit_lock:
+            if self.closed:
+                raise RuntimeError('Inference service is closed')
+
+            if self.state_shape is None:
+                if state.ndim != 4 or len(state) != 1:
+                    raise ValueError(f'State of shape {state.shape} is not a single state')
+                self.state_shape = state.shape
+            elif state.shape != self.state_shape:
+                raise ValueError(f'State of shape {state.shape} differs from'
+                                 f' the states of shape {self.state_shape}')
+
+            self.requests.put((state, future, time.perf_counter()))
+
+        return future
+
+    def predict(self, state: np.ndarray) -> np.ndarray:
+        """ Gets Q-values of a state, waits for its batch.
+
+        Args:
+            state (np.ndarray): A (1, height, width, frames) state.
+
+        Returns:
+            np.ndarray: Q-values of every action.
+        """
+
+        return self.submit(state).result()
+
+    def close(self):
+        """ Stops the worker once the submitted states are predicted. """
+
+        with self.submit_lock:
+            if not self.closed:
+                self.closed = True
+                self.requests.put(None)
+
+        self.thread.join()
+
+    def _collect_batch(self, request) -> tuple:
+        batch = [request]
+        deadline = time.perf_counter() + self.max_wait
+        batch_size = min(self.max_batch_size, self.clients_number)
+        while len(batch) < batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = self.requests.get(timeout=timeout) if timeout > 0 \
+                    else self.requests.get_nowait()
+            except queue.Empty:
+                break
+
+            if request is None:
+                return batch, True
+
+            batch.append(request)
+
+        return batch, False
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            request = self.requests.get()
+            if request is None:
+                break
+
+            batch, stopped = self._collect_batch(request)
+
+            # The worker keeps running after an error of a batch, which
+            # is passed to the waiting callers
+            try:
+                self._predict_batch(batch)
+            except Exception as exception:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(exception)
+
+    def _predict_batch(self, batch: list):
+        if self.states is None:
+            self.states = np.empty((self.max_batch_size, *batch[0][0].shape[1:]),
+                                   dtype=batch[0][0].dtype)
+
+        states = self.states[:len(batch)]
+        for index, (state, _, _) in enumerate(batch):
+            states[index] = state[0]
+
+        start_time = time.perf_counter()
+        q_values = self.model.predict(states, verbose=0)
+
+        with self.stats_lock:
+            self.batch_sizes[len(batch)] += 1
+            self.requests_number += len(batch)
+            self.queue_times.extend(start_time - submit_time
+                                    for _, _, submit_time in batch)
+
+        for index, (_, future, _) in enumerate(batch):
+            future.set_result(q_values[index])
+
+    def get_stats(self) -> dict:
+        """ Gets the distribution of batch sizes and queue times.
+
+        Returns:
+            dict: Numbers of requests and batches, mean batch size, number
+                of batches of every size and queue time percentiles of the
+                latest requests, in milliseconds.
+        """
+
+        with self.stats_lock:
+            batch_sizes = dict(sorted(self.batch_sizes.items()))
+            queue_times = np.array(self.queue_times) * 1000
+            requests_number = self.requests_number
+
+        batches_number = sum(batch_sizes.values())
+        stats = {
+            'requests': requests_number,
+            'batches': batches_number,
+            'mean_batch_size': requests_number / batches_number if batches_number else 0,
+            'batch_sizes': batch_sizes,
+        }
+        for percentile in (50, 90, 99):
+            stats[f'queue_time_p{percentile}_ms'] = float(
+                np.percentile(queue_times, percentile)) if len(queue_times) else 0.0
+
+        return stats
@@ -3,10 +3,17 @@ import numpy as np
 import pickle
 import threading
 from enum import Enum, auto
+from typing import NamedTuple
 from PyQt5.QtCore import QThread, pyqtSignal
 
-from model.brain import Brain
+from main.game_manager import GameManager
+from main.pieces import Piece
+from model.batch_prefetcher import BatchPrefetcher
+from model.checkpointer import Checkpointer
 from model.dqn import DQN
+from model.frame_stack import FrameStack
+from model.numpy_model import NumpyModel
+from model.profiler import PhaseProfiler
 
 
 class ProcessType(Enum):
@@ -14,8 +21,22 @@ class ProcessType(Enum):
     PLAYING = auto()
 
 
+class BoardSnapshot(NamedTuple):
+    """ A copy of the game's state for drawing it in another thread. """
+    
+    board: np.ndarray
+    next_piece: Piece
+    score: int
+    epochs_number: int
+
+
 class ModelThread(QThread):
     """ An AI model that runs on a thread.
+    
+    Training runs its own headless game at full speed and publishes a
+    snapshot of the game after every action, which the GUI draws at its
+    own frame rate. Playing takes actions in the GUI's game, one action
+    at a time.
 
     Args:
         QThread (_type_): _description_
@@ -39,38 +60,87 @@ class ModelThread(QThread):
         self.max_memory = 100_000
         self.gamma = 0.9  # More importance to future rewards
         self.batch_size = 16
+        self.prefetch_batches = 2  # Batches sampled ahead, while the model trains
         self.last_states_number = 4
         self.epsilon = 1.0  # Exploration - default: 1.0
         self.epsilon_decay = 0.0002  # Exploitation
         self.epsilon_min = 0.05 
+        self.prioritized_memory = False  # Samples experiences by their TD error
+        self.target_update_interval = 1000  # Updates between target network syncs
+        self.mixed_precision = False  # Computes in float16 on supported GPUs
         self.epochs_number = 0
 
         self.model_file_path = 'model.keras'
-        self.memory_file_path = 'model_memory'
-        self.memory_file_path_temp = "model_memory.temp"
+        self.weights_file_path = 'model.npz'  # Exported for playing
+        
+        # Times of the training loop phases per epoch
+        self.profile = False
+        self.profile_csv_path = 'profile.csv'
+        self.profile_json_path = 'profile.json'
+        self.prometheus_file_path = None
+        self.memory_dir_path = 'model_memory_store'
+        self.progress_file_path = 'model_progress'
+        self.checkpoint_dir_path = 'checkpoints'
+        self.checkpoint_epochs = 1  # Epochs between checkpoints
+        self.checkpoint_seconds = None  # Or seconds between checkpoints
+        self.checkpoints_number = 3  # Last checkpoints that are kept
+        self.checkpointer = None
+        self.prefetcher = None
 
         self.dqn = None
         self.model = None
+        self.frame_stack = FrameStack(env_height, env_width, self.last_states_number)
         self.frame = None
+        self.env = None
+        self.snapshot = None  # Latest BoardSnapshot of the training game
         self.reward = 0
         self.game_over = False
         
         self.event = threading.Event()
         
+        if process_type == ProcessType.TRAINING:
+            self.env = GameManager()
+        
+        self.profiler = PhaseProfiler(self.profile, self.profile_csv_path,
+                                      self.profile_json_path, self.prometheus_file_path)
+        
         self._set_model()
 
+    def _is_weights_file_fresh(self) -> bool:
+        if not os.path.isfile(self.weights_file_path):
+            return False
+        
+        # Exported weights of an older model aren't used
+        return (not os.path.isfile(self.model_file_path)
+                or os.path.getmtime(self.weights_file_path)
+                >= os.path.getmtime(self.model_file_path))
+    
     def _set_model(self):
+        # Playing with exported weights runs without TensorFlow
+        if self.process_type == ProcessType.PLAYING and self._is_weights_file_fresh():
+            self.model = NumpyModel(self.weights_file_path)
+            print(f'Loaded exported model weights from {self.weights_file_path}')
+            return
+        
+        from model.brain import Brain  # Loads TensorFlow
+        
         # Selects brain object
         if self.process_type == ProcessType.TRAINING:
             brain = Brain(
                 (self.env_height, self.env_width, self.last_states_number),
-                self.learning_rate
+                self.learning_rate, self.mixed_precision
             )
         else:
             brain = Brain((self.env_height, self.env_width,
                            self.last_states_number))
             
-        self.dqn = DQN(self.max_memory, self.gamma)
+        # Only training needs the stored experiences
+        memory_dir_path = None
+        if self.process_type == ProcessType.TRAINING:
+            memory_dir_path = self.memory_dir_path
+        
+        self.dqn = DQN(self.max_memory, self.gamma, self.last_states_number,
+                       memory_dir_path, self.prioritized_memory)
         
         # Loads existing model or create a new one.
         if os.path.isfile(self.model_file_path):
@@ -81,15 +151,32 @@ class ModelThread(QThread):
         else:
             self.model = brain.create_model()
             print('Created new model')
+        
+        if self.process_type == ProcessType.TRAINING:
+            self.dqn.set_target_model(brain.create_target_model(self.model),
+                                      self.target_update_interval)
+            
+            # Checkpoints are saved in the background, while the
+            # training goes on
+            self.checkpointer = Checkpointer(
+                brain.create_checkpoint_model(self.model), self.model_file_path,
+                self.weights_file_path, self.progress_file_path,
+                self.checkpoint_dir_path, self.checkpoint_epochs,
+                self.checkpoint_seconds, self.checkpoints_number)
+            
+            # Next batches are sampled in the background, while the
+            # model trains
+            self.prefetcher = BatchPrefetcher(self.dqn, self.batch_size,
+                                              self.prefetch_batches)
     
-    def _load_model(self, brain: Brain):
+    def _load_model(self, brain):
         epsilon = 0
         epochs_number = 0
         
         model = brain.load_model(self.model_file_path)
-        if os.path.isfile(self.memory_file_path):
-            with open(self.memory_file_path, 'rb') as file:
-                self.dqn.memory, epsilon, epochs_number = pickle.load(file)
+        if os.path.isfile(self.progress_file_path):
+            with open(self.progress_file_path, 'rb') as file:
+                epsilon, epochs_number = pickle.load(file)
 
         if epsilon > 0:
             self.epsilon = epsilon
@@ -99,46 +186,40 @@ class ModelThread(QThread):
         
         return model
     
-    def _reset_states(self):
+    def _reset_states(self, frame):
         """ Resets the states.
         
-        Takes a random state as current and as a next state.
+        Takes the first frame as all the last frames and returns the
+        current state.
         """
         
-        batch_size = 1
-        current_state = np.zeros((
-            batch_size, self.env_height, self.env_width, self.last_states_number))
-        
-        for i in range(self.last_states_number):
-            current_state[0, :, :, i] = self.frame  # Takes 4 last frames
+        self.frame_stack.reset(frame)  # Takes 4 last frames
         
-        return current_state, current_state
+        return self.frame_stack.get_state()
 
     def _get_current_state(self):
         return self.frame, self.reward, self.game_over
     
-    def _save_progress(self):
-        self.model.save(self.model_file_path)
-        
-        with open(self.memory_file_path_temp, 'wb') as file:
-            # First writes into the temp file to prevent corruption of the
-            # original file
-            pickle.dump([self.dqn.memory, self.epsilon, self.epochs_number], file)
-        os.replace(self.memory_file_path_temp, self.memory_file_path)
+    def _publish_snapshot(self, score: int):
+        # The GUI only reads the reference to the latest snapshot, which
+        # is replaced as a whole and never changed. The score is the one
+        # the step returned, since getting it again clears the lines.
+        self.snapshot = BoardSnapshot(self.env.board.copy(), self.env.next_piece,
+                                      score, self.epochs_number)
     
     def _train(self):
         self.epochs_number += 1
-            
-        self.reset.emit()
-        self.event.wait()  # Block until the event is set
-        self.event.clear()  # Clear the event for the next cycle
         
-        current_state, next_state = self._reset_states()
+        self.env.reset()
+        self._publish_snapshot(0)
+        
+        current_state = self._reset_states(self.env.board)
         
         game_over = False
         steps = 0
         while not game_over:
             steps += 1
+            self.profiler.start()
             
             # Select action
             if np.random.rand() <= self.epsilon:
@@ -148,34 +229,38 @@ class ModelThread(QThread):
                 # Exploitation
                 q_values = self.model.predict(current_state, verbose=0)[0]  # First action
                 action = int(np.argmax(q_values))
+            self.profiler.lap('select_action')
             
             # Update the environment
-            self.step.emit(action)
-            self.event.wait()  # Block until the event is set
-            self.event.clear()  # Clear the event for the next cycle
-            
-            frame, reward, game_over = self._get_current_state()
+            frame, reward, game_over = self.env.step(action)
+            self._publish_snapshot(reward)
+            self.profiler.lap('env_step')
             
-            frame = np.reshape(frame, (1, self.env_height, self.env_width, 1))
-            
-            # axis=3 is a number of frames. Here we add new frame to the
-            # next state
-            next_state = np.append(next_state, frame, axis=3)
-            
-            # Previous state should be removed, the oldest one
-            next_state = np.delete(next_state, 0, axis=3)
+            # The new frame takes place of the oldest one. Only the newest
+            # frame of the current state is remembered, which stays in place.
+            self.frame_stack.push(frame)
+            next_state = self.frame_stack.get_state()
+            self.profiler.lap('frame_stack')
             
             self.dqn.remember([current_state, action, reward, next_state], game_over)
-            inputs, targets = self.dqn.get_batch(self.model, self.batch_size)
+            self.profiler.lap('remember')
+            inputs, targets, weights = self.prefetcher.get_batch(self.model)
+            self.profiler.lap('get_batch')
             # TODO: Consider checking inputs and targets types
             
-            self.model.train_on_batch(inputs, targets)
+            self.model.train_on_batch(inputs, targets, sample_weight=weights)
+            self.profiler.lap('train_on_batch')
+            
+            current_state = next_state
                                                     
         # Update epsilon and save the model
         self.epsilon -= self.epsilon_decay
         self.epsilon = max(self.epsilon, self.epsilon_min)
         
-        self._save_progress()
+        self.profiler.start()
+        self.checkpointer.save_if_due(self.model, self.dqn, self.epsilon, self.epochs_number)
+        self.profiler.lap('checkpoint')
+        self.profiler.end_epoch(self.epochs_number)
         
         print(
             (f'Epoch {self.epochs_number} - current score: {reward},'
@@ -188,7 +273,7 @@ class ModelThread(QThread):
         self.event.wait()  # Block until the event is set
         self.event.clear()  # Clear the event for the next cycle
         
-        current_state, next_state = self._reset_states()
+        current_state = self._reset_states(self.frame)
         game_over = False
         while not game_over:
             q_values = self.model.predict(current_state, verbose=0)[0]
@@ -200,16 +285,8 @@ class ModelThread(QThread):
             
             frame, _, game_over = self._get_current_state()
             
-            frame = np.reshape(frame, (1, self.env_height, self.env_width, 1))
-            
-            # axis=3 is a number of frames. Here we add new frame to the
-            # next state
-            next_state = np.append(next_state, frame, axis=3)
-            
-            # Previous state should be removed, the oldest one
-            next_state = np.delete(next_state, 0, axis=3)
-            
-            current_state = next_state
+            self.frame_stack.push(frame)
+            current_state = self.frame_stack.get_state()
 
     def receive_state(self, current_state: tuple):
         """ Receives signal from the Tetris GUI of current state.
@@ -0,0 +1,140 @@
+import json
+
+import numpy as np
+
+
+# Keras layers the NumPy model can run
+SUPPORTED_LAYERS = ('Rescaling', 'Conv2D', 'MaxPooling2D', 'Flatten', 'Dense')
+
+
+def export_weights(model, file_path: str):
+    """ Exports layers and weights of a Keras model into a `.npz` file,
+    which `NumpyModel` loads without TensorFlow.
+
+    Args:
+        model: A model that `Brain.create_model` creates.
+        file_path (str): Path of the `.npz` file.
+
+    Raises:
+        ValueError: If the model has a layer the NumPy model can't run.
+    """
+
+    layers = []
+    arrays = {}
+    for index, layer in enumerate(model.layers):
+        layer_type = type(layer).__name__
+        if layer_type not in SUPPORTED_LAYERS:
+            raise ValueError(f'Layer {layer.name} of type {layer_type} is not supported')
+
+        config = layer.get_config()
+        layers.append({
+            'type': layer_type,
+            'activation': config.get('activation', 'linear'),
+            'pool_size': config.get('pool_size'),
+            'padding': config.get('padding', 'valid'),
+            'strides': config.get('strides'),
+            'scale': config.get('scale'),
+            'offset': config.get('offset'),
+        })
+
+        for weight_index, weight in enumerate(layer.get_weights()):
+            arrays[f'layer_{index}_{weight_index}'] = weight
+
+    # Writes into a file object, so the path isn't changed by np.savez
+    with open(file_path, 'wb') as file:
+        np.savez(file, layers=json.dumps(layers), **arrays)
+
+
+class NumpyModel:
+    """ A NumPy forward pass of an exported model, used for playing.
+
+    Convolutions are a matrix product of the kernels with all the
+    windows of a batch of states (im2col). Supports rescaling,
+    convolutions with valid padding and strides of 1, max pooling,
+    flatten and dense layers with ReLU or linear activations. States of
+    any dtype are cast to float32.
+    """
+
+    def __init__(self, file_path: str):
+        with np.load(file_path) as data:
+            layers = json.loads(str(data['layers']))
+            self.layers = []
+            for index, layer in enumerate(layers):
+                weights = []
+                while f'layer_{index}_{len(weights)}' in data:
+                    weights.append(
+                        data[f'layer_{index}_{len(weights)}'].astype(np.float32))
+
+                self._check_layer(layer)
+                self.layers.append((layer, weights))
+
+    @staticmethod
+    def _check_layer(layer: dict):
+        if layer['activation'] not in ('relu', 'linear'):
+            raise ValueError(f'Activation {layer["activation"]} is not supported')
+
+        if layer['type'] == 'Conv2D' and (
+                layer['padding'] != 'valid' or tuple(layer['strides']) != (1, 1)):
+            raise ValueError('Only convolutions with valid padding and strides'
+                             ' of 1 are supported')
+
+        if layer['type'] == 'MaxPooling2D' and (
+                layer['padding'] != 'valid'
+                or tuple(layer['strides'] or layer['pool_size']) != tuple(layer['pool_size'])):
+            raise ValueError('Only max pooling with valid padding and strides'
+                             ' of the pool size is supported')
+
+    @staticmethod
+    def _convolve(inputs: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+        kernel_height, kernel_width = kernel.shape[:2]
+        windows = np.lib.stride_tricks.sliding_window_view(
+            inputs, (kernel_height, kernel_width), axis=(1, 2))
+
+        # Windows are (batch, rows, columns, channels, kernel rows,
+        # kernel columns), the product copies them into a matrix
+        return np.tensordot(windows, kernel, axes=([4, 5, 3], [0, 1, 2]))
+
+    @staticmethod
+    def _max_pool(inputs: np.ndarray, pool_size: tuple) -> np.ndarray:
+        pool_height, pool_width = pool_size
+        batch_size, height, width, channels = inputs.shape
+        height //= pool_height
+        width //= pool_width
+
+        inputs = inputs[:, :height * pool_height, :width * pool_width]
+        inputs = inputs.reshape(batch_size, height, pool_height, width, pool_width, channels)
+
+        return inputs.max(axis=(2, 4))
+
+    def predict(self, states: np.ndarray, verbose=0) -> np.ndarray:
+        """ Gets Q-values of a batch of states, same as Keras `predict`.
+
+        Args:
+            states (np.ndarray): A (batch, height, width, frames) batch.
+            verbose: Unused, keeps the Keras signature.
+
+        Returns:
+            np.ndarray: A (batch, actions) array of Q-values.
+        """
+
+        outputs = np.asarray(states, dtype=np.float32)
+        for layer, weights in self.layers:
+            layer_type = layer['type']
+            if layer_type == 'Rescaling':
+                outputs = outputs * layer['scale'] + layer['offset']
+            elif layer_type == 'Conv2D':
+                outputs = self._convolve(outputs, weights[0])
+            elif layer_type == 'MaxPooling2D':
+                outputs = self._max_pool(outputs, layer['pool_size'])
+            elif layer_type == 'Flatten':
+                outputs = outputs.reshape(len(outputs), -1)
+            else:
+                outputs = outputs @ weights[0]
+
+            if len(weights) > 1:
+                outputs += weights[1]  # Bias
+
+            if layer['activation'] == 'relu':
+                outputs = np.maximum(outputs, 0, out=outputs)
+
+        return outputs
@@ -0,0 +1,132 @@
+import csv
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+
+class PhaseProfiler:
+    """ Measures phases of the training loop and summarizes them per
+    epoch.
+
+    A step starts with `start` and every phase ends with `lap`, which
+    takes the time since the previous lap, so a phase costs a single
+    clock read. At the end of an epoch the times of every phase are
+    summarized as percentiles and the summaries of the last epochs are
+    written to CSV and JSON files, and the last one optionally to a
+    Prometheus text file.
+
+    A disabled profiler replaces its methods with no-ops.
+    """
+
+    percentiles = (50, 90, 99)
+    csv_fields = ('epoch', 'phase', 'count', 'total_ms', 'mean_ms',
+                  *(f'p{percentile}_ms' for percentile in percentiles), 'max_ms')
+
+    def __init__(self, enabled: bool = True, csv_path: str = None, json_path: str = None,
+                 prometheus_path: str = None, epochs_number: int = 1000):
+        self.enabled = enabled
+        self.csv_path = csv_path
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+
+        self.times = {}  # Phase times of the current epoch, in seconds
+        self.last_time = 0.0
+        self.summaries = deque(maxlen=epochs_number)  # Of the last epochs
+
+        if not enabled:
+            self.start = self._skip
+            self.lap = self._skip
+            self.end_epoch = self._skip
+
+    @staticmethod
+    def _skip(*args):
+        return None
+
+    def start(self):
+        """ Starts measuring phases of a step. """
+
+        self.last_time = time.perf_counter()
+
+    def lap(self, phase: str):
+        """ Ends a phase, which took the time since the previous phase.
+
+        Args:
+            phase (str): Name of the phase.
+        """
+
+        now = time.perf_counter()
+        times = self.times.get(phase)
+        if times is None:
+            times = self.times[phase] = []
+
+        times.append(now - self.last_time)
+        self.last_time = now
+
+    def end_epoch(self, epoch: int) -> dict:
+        """ Summarizes the phases of an epoch and writes the files.
+
+        Args:
+            epoch (int): Number of the epoch.
+
+        Returns:
+            dict: Summary of every phase, times are in milliseconds.
+        """
+
+        phases = {}
+        for phase, times in self.times.items():
+            times = np.array(times) * 1000
+            summary = {
+                'count': len(times),
+                'total_ms': float(times.sum()),
+                'mean_ms': float(times.mean()),
+            }
+            for percentile, value in zip(self.percentiles,
+                                         np.percentile(times, self.percentiles)):
+                summary[f'p{percentile}_ms'] = float(value)
+            summary['max_ms'] = float(times.max())
+            phases[phase] = summary
+
+        self.times = {}
+        self.summaries.append({'epoch': epoch, 'phases': phases})
+
+        if self.csv_path:
+            self._write(self.csv_path, self._write_csv)
+        if self.json_path:
+            self._write(self.json_path, lambda file: json.dump(list(self.summaries), file))
+        if self.prometheus_path:
+            self._write(self.prometheus_path, self._write_prometheus)
+
+        return phases
+
+    @staticmethod
+    def _write(file_path: str, write):
+        # First writes into the temp file, so readers never see a half
+        # written file
+        with open(f'{file_path}.temp', 'w', newline='') as file:
+            write(file)
+        os.replace(f'{file_path}.temp', file_path)
+
+    def _write_csv(self, file):
+        writer = csv.DictWriter(file, self.csv_fields)
+        writer.writeheader()
+        for summary in self.summaries:
+            for phase, values in summary['phases'].items():
+                writer.writerow({'epoch': summary['epoch'], 'phase': phase, **values})
+
+    def _write_prometheus(self, file):
+        summary = self.summaries[-1]
+        file.write('# HELP tetris_phase_seconds Time of a training loop phase in the last epoch.\n')
+        file.write('# TYPE tetris_phase_seconds summary\n')
+        for phase, values in summary['phases'].items():
+            for percentile in self.percentiles:
+                file.write(f'tetris_phase_seconds{{phase="{phase}",quantile="{percentile / 100}"}}'
+                           f' {values[f"p{percentile}_ms"] / 1000}\n')
+            file.write(f'tetris_phase_seconds_sum{{phase="{phase}"}} {values["total_ms"] / 1000}\n')
+            file.write(f'tetris_phase_seconds_count{{phase="{phase}"}} {values["count"]}\n')
+
+        file.write('# HELP tetris_epoch Last profiled epoch.\n')
+        file.write('# TYPE tetris_epoch gauge\n')
+        file.write(f'tetris_epoch {summary["epoch"]}\n')
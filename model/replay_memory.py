@@ -0,0 +1,274 @@
+import json
+import os
+
+import numpy as np
+
+
+class ReplayMemory:
+    """ Replay memory of a fixed size, backed by preallocated arrays.
+
+    Every slot keeps a single frame, the board after an action, with
+    the action, reward and game over flag that led to it. The first slot
+    of a game keeps only the initial board. States are rebuilt from the
+    last `frames_number` frames of a game when sampling, where the first
+    frame of a game is repeated, same as when a game is reset.
+
+    Frames keep only the occupancy of the board's cells, packed by 8
+    cells per byte, so a 20x10 board takes 25 bytes. They are unpacked
+    into 0/1 states only for the sampled slots.
+
+    When a directory is given, the arrays are memory-mapped `.npy` files
+    in it. Written slots reach the disk with `flush`, and an existing
+    memory is opened in place, without reading it.
+    """
+
+    metadata_file_name = 'memory.json'
+
+    def __init__(self, capacity: int, frames_number: int = 4, directory: str = None):
+        self.capacity = capacity
+        self.frames_number = frames_number
+        self.directory = directory
+
+        self.cursor = 0  # Next slot to write
+        self.size = 0  # Number of filled slots
+        self.transitions = 0  # Number of filled slots that are transitions
+
+        if directory and os.path.isfile(self._get_path(self.metadata_file_name)):
+            self._open()
+            return
+
+        # Frames are allocated with the first frame, when its shape is known
+        self.frames = None
+        self.frame_shape = None
+        self.actions = self._create_array('actions', (capacity,), np.uint8)
+        self.rewards = self._create_array('rewards', (capacity,), np.float32)
+        self.game_overs = self._create_array('game_overs', (capacity,), bool)
+
+        # Number of slots from the first slot of the game, 0 for the
+        # first slot
+        self.steps = self._create_array('steps', (capacity,), np.int64)
+
+    def __len__(self):
+        return self.transitions
+
+    def _get_path(self, file_name: str) -> str:
+        return os.path.join(self.directory, file_name)
+
+    def _create_array(self, name: str, shape: tuple, dtype) -> np.ndarray:
+        if not self.directory:
+            return np.zeros(shape, dtype=dtype)
+
+        os.makedirs(self.directory, exist_ok=True)
+        return np.lib.format.open_memmap(
+            self._get_path(f'{name}.npy'), mode='w+', dtype=dtype, shape=shape)
+
+    def _open_array(self, name: str) -> np.ndarray:
+        return np.lib.format.open_memmap(self._get_path(f'{name}.npy'), mode='r+')
+
+    def _open(self):
+        with open(self._get_path(self.metadata_file_name)) as file:
+            metadata = json.load(file)
+
+        if (metadata['capacity'] != self.capacity
+                or metadata['frames_number'] != self.frames_number):
+            raise ValueError(
+                f'Memory in {self.directory} has capacity {metadata["capacity"]}'
+                f' and {metadata["frames_number"]} frames per state')
+
+        if metadata['size'] and 'frame_shape' not in metadata:
+            raise ValueError(
+                f'Memory in {self.directory} keeps unpacked frames, remove it'
+                f' to start a new memory')
+
+        self.cursor = metadata['cursor']
+        self.size = metadata['size']
+        self.transitions = metadata['transitions']
+
+        self.frames = self._open_array('frames') if self.size else None
+        self.frame_shape = tuple(metadata['frame_shape']) if self.size else None
+        self.actions = self._open_array('actions')
+        self.rewards = self._open_array('rewards')
+        self.game_overs = self._open_array('game_overs')
+        self.steps = self._open_array('steps')
+
+    def get_metadata(self) -> dict:
+        """ Gets the memory's position, which is written with `flush`. """
+
+        return {
+            'capacity': self.capacity,
+            'frames_number': self.frames_number,
+            'cursor': self.cursor,
+            'size': self.size,
+            'transitions': self.transitions,
+            'frame_shape': list(self.frame_shape) if self.frame_shape else None,
+        }
+
+    def flush(self, metadata: dict = None):
+        """ Writes the changed slots and the memory's position to the
+        disk. Does nothing for a memory that isn't backed by files.
+
+        Args:
+            metadata (dict, optional): Position taken earlier with
+                `get_metadata`, when flushing in another thread. The
+                current position by default.
+        """
+
+        if not self.directory:
+            return
+
+        for array in (self.frames, self.actions, self.rewards,
+                      self.game_overs, self.steps):
+            if array is not None:
+                array.flush()
+
+        metadata = metadata or self.get_metadata()
+
+        # First writes into the temp file to prevent corruption of the
+        # original file
+        metadata_path = self._get_path(self.metadata_file_name)
+        with open(f'{metadata_path}.temp', 'w') as file:
+            json.dump(metadata, file)
+        os.replace(f'{metadata_path}.temp', metadata_path)
+
+    @staticmethod
+    def _pack(frame: np.ndarray) -> np.ndarray:
+        # Any non-zero cell is packed as 1
+        if frame.dtype != np.uint8:
+            frame = frame != 0
+
+        return np.packbits(frame, axis=None)
+
+    def _write(self, frame: np.ndarray, action: int, reward: float,
+               game_over: bool, steps: int):
+        if self.frames is None:
+            self.frame_shape = frame.shape
+            self.frames = self._create_array(
+                'frames', (self.capacity, (frame.size + 7) // 8), np.uint8)
+
+        slot = self.cursor
+        if self.size == self.capacity and self.steps[slot] > 0:
+            self.transitions -= 1  # Oldest experience
+
+        self.frames[slot] = self._pack(frame)
+        self.actions[slot] = action
+        self.rewards[slot] = reward
+        self.game_overs[slot] = game_over
+        self.steps[slot] = steps
+
+        if steps > 0:
+            self.transitions += 1
+
+        self.cursor = (slot + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def is_last_frame(self, frame: np.ndarray) -> bool:
+        """ Checks whether a frame is the last remembered frame of a game
+        that isn't over.
+
+        Args:
+            frame (np.ndarray): Game's board.
+        """
+
+        if self.size == 0:
+            return False
+
+        last_slot = (self.cursor - 1) % self.capacity
+        return (not self.game_overs[last_slot]
+                and np.array_equal(self.frames[last_slot], self._pack(frame)))
+
+    def start_game(self, frame: np.ndarray):
+        """ Remembers the initial board of a new game.
+
+        Args:
+            frame (np.ndarray): Game's board.
+        """
+
+        self._write(frame, 0, 0, False, 0)
+
+    def add(self, action: int, reward: float, frame: np.ndarray, game_over: bool):
+        """ Remembers a transition of the current game.
+
+        Args:
+            action (int): Action that was taken.
+            reward (float): Reward of the action.
+            frame (np.ndarray): Game's board after the action.
+            game_over (bool): Game's state.
+        """
+
+        steps = self.steps[(self.cursor - 1) % self.capacity] + 1
+        self._write(frame, action, reward, game_over, steps)
+
+    def get_states(self, slots: np.ndarray) -> np.ndarray:
+        """ Rebuilds the states that end with the frames of given slots.
+
+        Args:
+            slots (np.ndarray): Slots of the last frames.
+
+        Returns:
+            np.ndarray: States of shape (slots, height, width, frames) of
+                0/1 cells, from the oldest frame to the newest one.
+        """
+
+        offsets = np.minimum(np.arange(self.frames_number - 1, -1, -1),
+                             self.steps[slots, None])
+        packed = self.frames[(slots[:, None] - offsets) % self.capacity]
+
+        # Unpacks all the frames of the states at once
+        cells = np.unpackbits(packed, axis=-1, count=np.prod(self.frame_shape))
+        states = cells.reshape(*packed.shape[:2], *self.frame_shape)
+
+        return np.moveaxis(states, 1, -1)
+
+    def is_sampleable(self, slots: np.ndarray) -> np.ndarray:
+        """ Checks which slots hold transitions with all their frames.
+
+        Args:
+            slots (np.ndarray): Slots to check.
+
+        Returns:
+            np.ndarray: True for every slot that can be sampled.
+        """
+
+        # A transition needs its previous frames, which are lost once
+        # the oldest slots are overwritten
+        oldest_slot = self.cursor if self.size == self.capacity else 0
+        age = (slots - oldest_slot) % self.capacity
+        steps = self.steps[slots]
+
+        return (steps > 0) & (age >= np.minimum(steps, self.frames_number))
+
+    def get_transitions(self, slots: np.ndarray) -> tuple:
+        """ Gets transitions of given slots.
+
+        Args:
+            slots (np.ndarray): Sampleable slots.
+
+        Returns:
+            tuple: Current states, actions, rewards, next states and
+                game over flags of the transitions.
+        """
+
+        current_states = self.get_states((slots - 1) % self.capacity)
+        next_states = self.get_states(slots)
+
+        return (current_states, self.actions[slots], self.rewards[slots],
+                next_states, self.game_overs[slots])
+
+    def sample(self, batch_size: int) -> tuple:
+        """ Samples random transitions uniformly.
+
+        Args:
+            batch_size (int): Number of transitions.
+
+        Returns:
+            tuple: Slots of the transitions and the transitions, same as
+                `get_transitions`.
+        """
+
+        slots = np.random.randint(0, self.size, size=batch_size)
+        invalid = ~self.is_sampleable(slots)
+        while invalid.any():
+            slots[invalid] = np.random.randint(0, self.size, size=invalid.sum())
+            invalid = ~self.is_sampleable(slots)
+
+        return slots, self.get_transitions(slots)
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class SumTree:
+    """ A binary tree where every node holds the sum of its children.
+
+    Leaves are sampled in proportion to their values and updated in
+    O(log n). Both operations take arrays of leaves and walk the levels
+    of the tree for all of them at once.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+
+        # Leaves are the last level of a full tree, root is at index 1
+        self.leaves_number = max(2, 1 << (capacity - 1).bit_length())
+        self.tree = np.zeros(2 * self.leaves_number, dtype=np.float64)
+
+    @property
+    def total(self) -> float:
+        """ Sum of all the leaves. """
+
+        return self.tree[1]
+
+    def get(self, indices: np.ndarray) -> np.ndarray:
+        """ Gets values of given leaves. """
+
+        return self.tree[self.leaves_number + indices]
+
+    def update(self, indices: np.ndarray, values: np.ndarray):
+        """ Sets values of given leaves and updates their ancestors.
+
+        Args:
+            indices (np.ndarray): Indices of the leaves.
+            values (np.ndarray): New values of the leaves.
+        """
+
+        nodes = self.leaves_number + np.asarray(indices)
+        self.tree[nodes] = values
+
+        while True:
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            if nodes[0] == 1:
+                break
+
+    def find(self, values: np.ndarray) -> np.ndarray:
+        """ Finds the leaves where the cumulative sum of the leaves
+        reaches given values.
+
+        Args:
+            values (np.ndarray): Values in range [0, total).
+
+        Returns:
+            np.ndarray: Indices of the leaves.
+        """
+
+        # A value of the total, which rounding can give, would walk into
+        # the empty leaves after the capacity
+        values = np.minimum(values, np.nextafter(self.total, 0))
+
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.leaves_number:
+            left_nodes = 2 * nodes
+            left_sums = self.tree[left_nodes]
+
+            go_right = values >= left_sums
+            values = np.where(go_right, values - left_sums, values)
+            nodes = np.where(go_right, left_nodes + 1, left_nodes)
+
+        # Rounding of the sums can still pass the last leaf
+        return np.minimum(nodes - self.leaves_number, self.capacity - 1)
@@ -0,0 +1,21 @@
+import argparse
+import time
+
+from main.recording import Recording, Replayer
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replays recorded games without GUI.')
+    parser.add_argument('recordings', nargs='+', help='recording file paths')
+    args = parser.parse_args()
+    
+    for file_path in args.recordings:
+        recording = Recording.load(file_path)
+        
+        start_time = time.perf_counter()
+        _, score, game_over = Replayer(recording).run()
+        elapsed_time = time.perf_counter() - start_time
+        
+        print((f'{file_path} - seed: {recording.seed}, actions: {len(recording)},'
+               f' score: {score}, game over: {game_over},'
+               f' {len(recording) / max(elapsed_time, 1e-9):.0f} actions/s'))
@@ -0,0 +1,20 @@
+import argparse
+import sys
+from PyQt5.QtWidgets import QApplication
+
+from environment import Tetris
+from main.recording import Recording
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replays a recorded game.')
+    parser.add_argument('recording', help='recording file path')
+    parser.add_argument('--speed', type=float, default=10,
+                        help='actions per second, 10 by default')
+    args = parser.parse_args()
+    
+    app = QApplication(sys.argv)
+    window = Tetris(recording=Recording.load(args.recording), replay_speed=args.speed)
+    window.reset()
+    window.show()
+    sys.exit(app.exec_())
@@ -0,0 +1,66 @@
+import numpy as np
+
+from main.game_manager import GameManager
+from model.actor_learner import ActorPool, TransitionQueue, start_games, step_games
+from model.dqn import DQN
+from model.frame_stack import FrameStack
+
+
+HEIGHT = 20
+WIDTH = 10
+FRAMES_NUMBER = 4
+GAMES_NUMBER = 4
+
+
+def _get_last_frame(queue: TransitionQueue) -> np.ndarray:
+    # Frame after the last action, followed by the initial board of the
+    # next game when the game is over
+    written = queue.counters[0]
+    offset = 2 if queue.starts[(written - 1) % queue.capacity] else 1
+
+    return queue.frames[(written - offset) % queue.capacity]
+
+
+def test_sampled_transitions_are_game_transitions():
+    """ Transitions of games played together, as an actor plays them,
+    are remembered with the frames of their own games only.
+    """
+
+    envs = [GameManager(seed=seed) for seed in range(GAMES_NUMBER)]
+    frame_stacks = [FrameStack(HEIGHT, WIDTH, FRAMES_NUMBER) for _ in range(GAMES_NUMBER)]
+    queues = [TransitionQueue(4096, HEIGHT, WIDTH) for _ in range(GAMES_NUMBER)]
+
+    # The pool's learner side, without actor processes
+    pool = ActorPool(1, GAMES_NUMBER, (HEIGHT, WIDTH, FRAMES_NUMBER), 1.0)
+    pool.queues = queues
+    dqn = DQN(50_000, 0.9, FRAMES_NUMBER)
+
+    # Current and next states of every transition that was played
+    transitions = set()
+    rng = np.random.default_rng(0)
+    try:
+        start_games(envs, frame_stacks, queues)
+        for step in range(3000):
+            states = [frame_stack.get_state()[0].copy() for frame_stack in frame_stacks]
+            step_games(envs, frame_stacks, queues, rng.integers(0, 4, size=GAMES_NUMBER))
+
+            for state, queue in zip(states, queues):
+                frame = (_get_last_frame(queue) != 0).astype(np.uint8)
+                next_state = np.concatenate([state[..., 1:], frame[..., None]], axis=-1)
+                transitions.add((state.tobytes(), next_state.tobytes()))
+
+            if step % 10 == 0:
+                pool.drain(dqn)
+
+        pool.drain(dqn)
+    finally:
+        for queue in queues:
+            queue.block.unlink()
+
+    slots = np.arange(dqn.memory.size)
+    slots = slots[dqn.memory.is_sampleable(slots)]
+    current_states, _, _, next_states, _ = dqn.memory.get_transitions(slots)
+
+    assert len(slots) > 1000
+    for current_state, next_state in zip(current_states, next_states):
+        assert (current_state.tobytes(), next_state.tobytes()) in transitions
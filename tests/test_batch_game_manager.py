@@ -0,0 +1,47 @@
+import numpy as np
+
+from main.batch_game_manager import BatchGameManager
+from main.game_manager import GameManager
+from main.pieces import PIECES
+
+
+GAMES_NUMBER = 4
+
+
+def _set_next_piece(env: GameManager, piece_type: int):
+    env.next_piece_type = int(piece_type)
+    env.next_piece = PIECES[env.next_piece_type]
+
+
+def _start_piece(env: GameManager, piece_type: int):
+    _set_next_piece(env, piece_type)
+    env._set_new_piece()
+
+
+def test_observations_match_game_manager():
+    """ Games of the batch manager give the same boards, rewards and
+    game overs as game managers that get the same pieces.
+    """
+
+    batch = BatchGameManager(GAMES_NUMBER, seed=1)
+    envs = [GameManager() for _ in range(GAMES_NUMBER)]
+    for game, env in enumerate(envs):
+        _start_piece(env, batch.piece[game])
+        assert np.array_equal(batch.observations[game], env.board)
+
+    rng = np.random.default_rng(0)
+    for _ in range(5000):
+        actions = rng.integers(0, 4, size=GAMES_NUMBER)
+        next_pieces = batch.next_piece.copy()
+        observations, rewards, game_overs = batch.step(actions)
+
+        for game, env in enumerate(envs):
+            _set_next_piece(env, next_pieces[game])
+            _, reward, game_over = env.step(int(actions[game]))
+            assert (reward, game_over) == (rewards[game], game_overs[game])
+
+            if game_over:
+                env.reset()
+                _start_piece(env, batch.piece[game])
+
+            assert np.array_equal(observations[game], env.board)
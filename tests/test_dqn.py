@@ -0,0 +1,39 @@
+import numpy as np
+
+from main.game_manager import GameManager
+from model.dqn import DQN
+
+
+class ZeroModel:
+    """ A model that predicts zero Q-values for every action. """
+
+    def predict(self, states, verbose=0):
+        return np.zeros((len(states), 4), dtype=np.float32)
+
+
+def _play(dqn: DQN, env: GameManager, steps: int):
+    for step in range(steps):
+        frame, reward, game_over = env.step(step % 4)
+        dqn.add(step % 4, reward, frame, game_over)
+        if game_over:
+            env.reset()
+            dqn.start_game(env.board)
+
+
+def test_batch_of_overwritten_slots_is_sampled_again():
+    """ Prefetched experiences that were all overwritten before their
+    batch was trained on are replaced with new ones.
+    """
+
+    env = GameManager(seed=0)
+    dqn = DQN(64, 0.9, 4, prioritized=True)
+    dqn.start_game(env.board)
+    _play(dqn, env, 100)
+
+    samples = dqn.sample(16)
+    _play(dqn, env, 64)
+
+    inputs, targets, weights = dqn.get_batch(ZeroModel(), 16, samples)
+
+    assert len(inputs) == len(targets) == len(weights) == 16
+    assert np.isclose(dqn.priorities.total, dqn.priorities.get(np.arange(64)).sum())
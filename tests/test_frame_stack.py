@@ -0,0 +1,31 @@
+import numpy as np
+
+from model.frame_stack import FrameStack
+
+
+HEIGHT = 20
+WIDTH = 10
+FRAMES_NUMBER = 4
+
+
+def test_states_hold_last_frames_and_stay_valid_for_a_push():
+    """ Every state holds the last frames, oldest first, and the
+    previous state isn't changed by the next push.
+    """
+
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 8, size=(30, HEIGHT, WIDTH), dtype=np.uint8)
+    frame_stack = FrameStack(HEIGHT, WIDTH, FRAMES_NUMBER)
+
+    frame_stack.reset(frames[0])
+    history = [frames[0]] * FRAMES_NUMBER
+    for frame in frames[1:]:
+        previous_state = frame_stack.get_state()
+        previous_copy = previous_state.copy()
+
+        frame_stack.push(frame)
+        history.append(frame)
+
+        expected = np.stack(history[-FRAMES_NUMBER:], axis=-1) != 0
+        assert np.array_equal(frame_stack.get_state()[0], expected)
+        assert np.array_equal(previous_state, previous_copy)
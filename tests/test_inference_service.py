@@ -0,0 +1,70 @@
+import threading
+
+import numpy as np
+import pytest
+
+from model.inference_service import InferenceService
+
+
+STATE_SHAPE = (1, 20, 10, 4)
+
+
+class CornerModel:
+    """ A model whose Q-values are the top left cell of every frame, so
+    every row of a batch can be told apart. Fails on negative states.
+    """
+
+    def predict(self, states, verbose=0):
+        if (states < 0).any():
+            raise ValueError('Negative state')
+
+        return states[:, 0, 0, :].astype(np.float32)
+
+
+def _state(value: float) -> np.ndarray:
+    return np.full(STATE_SHAPE, value, dtype=np.float32)
+
+
+def test_every_caller_gets_its_own_q_values():
+    clients_number = 8
+    service = InferenceService(CornerModel(), max_batch_size=4, clients_number=clients_number)
+    results = {}
+
+    def client(client_id: int):
+        results[client_id] = [service.predict(_state(client_id * 100 + step))
+                              for step in range(50)]
+
+    threads = [threading.Thread(target=client, args=(client_id,))
+               for client_id in range(clients_number)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    service.close()
+
+    for client_id, q_values in results.items():
+        for step, values in enumerate(q_values):
+            assert np.array_equal(values, np.full(4, client_id * 100 + step))
+
+    stats = service.get_stats()
+    assert stats['requests'] == clients_number * 50
+    assert max(stats['batch_sizes']) <= 4
+
+
+def test_error_of_a_batch_is_set_to_its_futures():
+    service = InferenceService(CornerModel(), max_wait=1.0, clients_number=2)
+
+    futures = [service.submit(_state(-1)), service.submit(_state(1))]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+
+    # The worker keeps serving after the error
+    assert np.array_equal(service.predict(_state(2)), np.full(4, 2))
+
+    with pytest.raises(ValueError):
+        service.submit(np.zeros((1, 20, 10, 3), dtype=np.float32))
+
+    service.close()
+    with pytest.raises(RuntimeError):
+        service.submit(_state(3))
@@ -0,0 +1,122 @@
+import json
+
+import numpy as np
+
+from model.numpy_model import NumpyModel
+
+
+def _create_model(directory) -> NumpyModel:
+    """ Creates a NumPy model of `Brain.create_model` layers with random
+    weights, same as the benchmarks do.
+    """
+
+    rng = np.random.default_rng(0)
+    layers = [
+        {'type': 'Rescaling', 'activation': 'linear', 'pool_size': None,
+         'padding': 'valid', 'strides': None, 'scale': 0.5, 'offset': 0.25},
+        {'type': 'Conv2D', 'activation': 'relu', 'pool_size': None,
+         'padding': 'valid', 'strides': [1, 1]},
+        {'type': 'MaxPooling2D', 'activation': 'linear', 'pool_size': [2, 2],
+         'padding': 'valid', 'strides': [2, 2]},
+        {'type': 'Conv2D', 'activation': 'relu', 'pool_size': None,
+         'padding': 'valid', 'strides': [1, 1]},
+        {'type': 'Flatten', 'activation': 'linear', 'pool_size': None,
+         'padding': 'valid', 'strides': None},
+        {'type': 'Dense', 'activation': 'relu', 'pool_size': None,
+         'padding': 'valid', 'strides': None},
+        {'type': 'Dense', 'activation': 'linear', 'pool_size': None,
+         'padding': 'valid', 'strides': None},
+    ]
+    shapes = {1: ((3, 3, 4, 32), (32,)), 3: ((2, 2, 32, 64), (64,)),
+              5: ((1536, 256), (256,)), 6: ((256, 4), (4,))}
+    arrays = {f'layer_{index}_{weight_index}': rng.normal(0, 0.1, shape).astype(np.float32)
+              for index, weight_shapes in shapes.items()
+              for weight_index, shape in enumerate(weight_shapes)}
+
+    file_path = directory / 'model.npz'
+    with open(file_path, 'wb') as file:
+        np.savez(file, layers=json.dumps(layers), **arrays)
+
+    return NumpyModel(str(file_path))
+
+
+def _convolve(inputs: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+    """ Valid convolution with strides of 1, a window at a time. """
+
+    kernel_height, kernel_width, _, filters = kernel.shape
+    batch_size, height, width, _ = inputs.shape
+    outputs = np.zeros((batch_size, height - kernel_height + 1,
+                        width - kernel_width + 1, filters))
+    for sample in range(batch_size):
+        for row in range(outputs.shape[1]):
+            for column in range(outputs.shape[2]):
+                window = inputs[sample, row:row + kernel_height, column:column + kernel_width]
+                for kernel_filter in range(filters):
+                    outputs[sample, row, column, kernel_filter] = np.sum(
+                        window * kernel[..., kernel_filter])
+
+    return outputs
+
+
+def _max_pool(inputs: np.ndarray, pool_size: tuple) -> np.ndarray:
+    pool_height, pool_width = pool_size
+    batch_size, height, width, channels = inputs.shape
+    outputs = np.zeros((batch_size, height // pool_height, width // pool_width, channels))
+    for row in range(outputs.shape[1]):
+        for column in range(outputs.shape[2]):
+            window = inputs[:, row * pool_height:(row + 1) * pool_height,
+                            column * pool_width:(column + 1) * pool_width]
+            outputs[:, row, column] = window.max(axis=(1, 2))
+
+    return outputs
+
+
+def _predict(model: NumpyModel, states: np.ndarray) -> np.ndarray:
+    """ Forward pass of the model's layers in float64 with loops. """
+
+    outputs = states.astype(np.float64)
+    for layer, weights in model.layers:
+        if layer['type'] == 'Rescaling':
+            outputs = outputs * layer['scale'] + layer['offset']
+        elif layer['type'] == 'Conv2D':
+            outputs = _convolve(outputs, weights[0].astype(np.float64))
+        elif layer['type'] == 'MaxPooling2D':
+            outputs = _max_pool(outputs, layer['pool_size'])
+        elif layer['type'] == 'Flatten':
+            outputs = outputs.reshape(len(outputs), -1)
+        else:
+            outputs = outputs @ weights[0].astype(np.float64)
+
+        if len(weights) > 1:
+            outputs = outputs + weights[1]
+
+        if layer['activation'] == 'relu':
+            outputs = np.maximum(outputs, 0)
+
+    return outputs
+
+
+def test_convolve_matches_loops():
+    rng = np.random.default_rng(1)
+    inputs = rng.normal(size=(2, 7, 5, 3)).astype(np.float32)
+    kernel = rng.normal(size=(3, 2, 3, 4)).astype(np.float32)
+
+    outputs = NumpyModel._convolve(inputs, kernel)
+
+    assert outputs.shape == (2, 5, 4, 4)
+    np.testing.assert_allclose(outputs, _convolve(inputs, kernel), rtol=1e-5, atol=1e-5)
+
+
+def test_predict_matches_loops(tmp_path):
+    """ Boards of uint8 occupancy give the same Q-values as the loops,
+    for a single state and a batch.
+    """
+
+    model = _create_model(tmp_path)
+    states = np.random.default_rng(2).integers(0, 2, (3, 20, 10, 4), dtype=np.uint8)
+
+    expected = _predict(model, states)
+
+    assert model.predict(states).shape == (3, 4)
+    np.testing.assert_allclose(model.predict(states), expected, rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(model.predict(states[:1]), expected[:1], rtol=1e-4, atol=1e-4)
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from main.game_manager import GameManager
+from main.recording import Recording, Replayer
+
+
+def test_replayer_rebuilds_recorded_game():
+    env = GameManager(seed=3, record=True)
+    actions = np.random.default_rng(0).integers(0, 4, size=2000)
+    for action in actions:
+        board, score, game_over = env.step(int(action))
+        if game_over:
+            break
+
+    replayer = Replayer(Recording.from_bytes(env.recording.to_bytes()))
+    replayed_board, replayed_score, replayed_game_over = replayer.run()
+
+    assert np.array_equal(replayed_board, board)
+    assert (replayed_score, replayed_game_over) == (score, game_over)
+
+
+def test_place_in_recorded_game_raises():
+    env = GameManager(seed=3, record=True)
+    rotation, column = env.get_placements()[0]
+
+    with pytest.raises(RuntimeError):
+        env.place(rotation, column)
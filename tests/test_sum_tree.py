@@ -0,0 +1,21 @@
+import numpy as np
+
+from model.sum_tree import SumTree
+
+
+def test_find_total_stays_in_capacity():
+    """ A value of the total finds the last leaf, not the padding. """
+
+    tree = SumTree(10)
+    tree.update(np.arange(10), np.arange(1, 11, dtype=np.float64))
+
+    assert tree.find(np.array([tree.total])).tolist() == [9]
+
+
+def test_find_is_proportional():
+    tree = SumTree(5)
+    tree.update(np.arange(5), np.array([1.0, 0.0, 2.0, 0.0, 1.0]))
+
+    leaves = tree.find(np.array([0.0, 0.5, 1.0, 2.9, 3.0, 3.99]))
+
+    assert leaves.tolist() == [0, 0, 2, 2, 4, 4]
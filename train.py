@@ -1,11 +1,15 @@
+import argparse
 import numpy as np
 import os
 import pickle
 
 from main.actions import Action
 from main.game_manager import GameManager
-from model.brain import Brain
+from model.batch_prefetcher import BatchPrefetcher
+from model.checkpointer import Checkpointer
 from model.dqn import DQN
+from model.frame_stack import FrameStack
+from model.profiler import PhaseProfiler
 
 
 # TODO: Put hyperparameters into a file - TOML or JSON.
@@ -14,106 +18,181 @@ LEARNING_RATE = 0.00001
 MAX_MEMORY = 100_000
 GAMMA = 0.9  # More importance to future rewards
 BATCH_SIZE = 16
+PREFETCH_BATCHES = 2  # Batches sampled ahead, while the model trains
 LAST_STATES_NUMBER = 4
-epsilon = 1.0  # Exploration - default: 1.0
+EPSILON = 1.0  # Exploration - default: 1.0
 EPSILON_DECAY = 0.0002  # Exploitation
 EPSILON_MIN = 0.05 
+PRIORITIZED_MEMORY = False  # Samples experiences by their TD error
+TARGET_UPDATE_INTERVAL = 1000  # Updates between target network syncs
+MIXED_PRECISION = False  # Computes in float16 on supported GPUs
 
 MODEL_FILE_PATH = 'model.keras'
-MEMORY_FILE_PATH = 'model_memory'
-MEMORY_FILE_PATH_TEMP = "model_memory.temp"
+WEIGHTS_FILE_PATH = 'model.npz'  # Exported for playing without TensorFlow
+MEMORY_DIR_PATH = 'model_memory_store'
+PROGRESS_FILE_PATH = 'model_progress'
+CHECKPOINT_DIR_PATH = 'checkpoints'
+CHECKPOINT_EPOCHS = 1  # Epochs between checkpoints
+CHECKPOINTS_NUMBER = 3  # Last checkpoints that are kept
+PROFILE_CSV_PATH = 'profile.csv'
+PROFILE_JSON_PATH = 'profile.json'
 
+ACTIONS = list(Action)
 
-env = GameManager()
-HEIGHT = env.board_height
-WIDTH = env.board_width
 
-brain = Brain((HEIGHT, WIDTH, LAST_STATES_NUMBER), LEARNING_RATE)
-dqn = DQN(MAX_MEMORY, GAMMA)
-epochs_number = 0
-ACTIONS = list(Action)
+def parse_args():
+    parser = argparse.ArgumentParser(description='Trains the model without GUI.')
+    parser.add_argument('--epochs', type=int, default=None,
+                        help='number of epochs to train, trains until stopped by default')
+    parser.add_argument('--model', default=MODEL_FILE_PATH,
+                        help=f'model file path, {MODEL_FILE_PATH} by default')
+    parser.add_argument('--memory', default=MEMORY_DIR_PATH,
+                        help=f'replay memory directory, {MEMORY_DIR_PATH} by default')
+    parser.add_argument('--prioritized', action='store_true', default=PRIORITIZED_MEMORY,
+                        help='samples experiences by their TD error')
+    parser.add_argument('--prefetch', type=int, default=PREFETCH_BATCHES,
+                        help=(f'batches sampled ahead in the background, 0 samples every'
+                              f' batch in place, {PREFETCH_BATCHES} by default'))
+    parser.add_argument('--mixed-precision', action='store_true', default=MIXED_PRECISION,
+                        help='creates a new model with the mixed float16 policy')
+    parser.add_argument('--record', metavar='DIR', default=None,
+                        help='saves a recording of every game into a directory')
+    parser.add_argument('--profile', action='store_true',
+                        help=(f'writes times of the training loop phases per epoch'
+                              f' to {PROFILE_CSV_PATH} and {PROFILE_JSON_PATH}'))
+    parser.add_argument('--prometheus', metavar='FILE', default=None,
+                        help='also writes the phase times of the last epoch to a'
+                             ' Prometheus text file, needs --profile')
+    parser.add_argument('--checkpoint-epochs', type=int, default=CHECKPOINT_EPOCHS,
+                        help=f'epochs between checkpoints, {CHECKPOINT_EPOCHS} by default')
+    parser.add_argument('--checkpoint-seconds', type=float, default=None,
+                        help='also takes a checkpoint when this many seconds passed')
+    parser.add_argument('--keep-checkpoints', type=int, default=CHECKPOINTS_NUMBER,
+                        help=f'last checkpoints that are kept, {CHECKPOINTS_NUMBER} by default')
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    weights_file_path = os.path.splitext(args.model)[0] + '.npz'
+
+    # TensorFlow is loaded only after the arguments are parsed
+    from model.brain import Brain
+
+    env = GameManager(record=bool(args.record))
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+
+    height = env.board_height
+    width = env.board_width
+
+    brain = Brain((height, width, LAST_STATES_NUMBER), LEARNING_RATE, args.mixed_precision)
+    dqn = DQN(MAX_MEMORY, GAMMA, LAST_STATES_NUMBER, args.memory, args.prioritized)
+    epsilon = EPSILON
+    epochs_number = 0
+
+    # Loads existing model or create a new one.
+    if os.path.isfile(args.model):
+        model = brain.load_model(args.model)
+        if os.path.isfile(PROGRESS_FILE_PATH):
+            with open(PROGRESS_FILE_PATH, 'rb') as file:
+                epsilon, epochs_number = pickle.load(file)
+
+        print((f'Loaded existing model with epsilon: {epsilon:.5f},'
+               f' memory slots: {len(dqn.memory)}, epochs: {epochs_number}'))
+    else:
+        model = brain.create_model()
+        print('Created new model')
+
+    dqn.set_target_model(brain.create_target_model(model), TARGET_UPDATE_INTERVAL)
+
+    # Next batches are sampled in the background, while the model trains
+    prefetcher = BatchPrefetcher(dqn, BATCH_SIZE, args.prefetch)
+
+    # Last frames of the game, the model's input
+    frame_stack = FrameStack(height, width, LAST_STATES_NUMBER)
+
+    profiler = PhaseProfiler(args.profile, PROFILE_CSV_PATH, PROFILE_JSON_PATH,
+                             args.prometheus)
+
+    # Checkpoints are saved in the background, while the training goes on
+    checkpointer = Checkpointer(brain.create_checkpoint_model(model), args.model,
+                                weights_file_path, PROGRESS_FILE_PATH, CHECKPOINT_DIR_PATH,
+                                args.checkpoint_epochs, args.checkpoint_seconds,
+                                args.keep_checkpoints)
+
+    # Game loop
+    epochs_left = args.epochs
+    while epochs_left is None or epochs_left > 0:
+        if epochs_left is not None:
+            epochs_left -= 1
+
+        epochs_number += 1
+        env.reset()
+        frame_stack.reset(env.board)  # Takes 4 last frames
+        current_state = frame_stack.get_state()
+
+        game_over = False
+        steps = 0
+        while not game_over:
+            steps += 1
+            profiler.start()
+
+            # Select action
+            if np.random.rand() <= epsilon:
+                # Exploration
+                action = np.random.randint(0, 4)
+            else:
+                # Exploitation
+                q_values = model.predict(current_state, verbose=0)[0]  # First action
+                action = int(np.argmax(q_values))
+            profiler.lap('select_action')
+
+            # Update the environment
+            frame, reward, game_over = env.step(action)
+            profiler.lap('env_step')
+
+            # The new frame takes place of the oldest one. Only the newest
+            # frame of the current state is remembered, which stays in place.
+            frame_stack.push(frame)
+            next_state = frame_stack.get_state()
+            profiler.lap('frame_stack')
+
+            dqn.remember([current_state, action, reward, next_state], game_over)
+            profiler.lap('remember')
+            inputs, targets, weights = prefetcher.get_batch(model)
+            profiler.lap('get_batch')
+
+            model.train_on_batch(inputs, targets, sample_weight=weights)
+            profiler.lap('train_on_batch')
+
+            current_state = next_state
+
+        # Update epsilon and save the model
+        epsilon -= EPSILON_DECAY
+        epsilon = max(epsilon, EPSILON_MIN)
+
+        profiler.start()
+        checkpointer.save_if_due(model, dqn, epsilon, epochs_number)
+
+        if args.record:
+            env.recording.save(os.path.join(args.record, f'game_{epochs_number}.ttrs'))
+        profiler.lap('checkpoint')
+        profiler.end_epoch(epochs_number)
+
+        print((
+            f'Epoch {epochs_number} - current score: {reward},'
+            f' epsilon: {epsilon:.5f}, memory slots: {len(dqn.memory)}, steps: {steps}'
+        ))
+
+    prefetcher.close()
+
+    # The last epochs are saved before exiting
+    if checkpointer.last_epochs_number not in (None, epochs_number):
+        checkpointer.save(model, dqn, epsilon, epochs_number)
+    checkpointer.wait()
+
 
-        
-# Loads existing model or create a new one.
-if os.path.isfile(MODEL_FILE_PATH):
-    model = brain.load_model(MODEL_FILE_PATH)
-    if os.path.isfile(MEMORY_FILE_PATH):
-        with open(MEMORY_FILE_PATH, 'rb') as file:
-            dqn.memory, epsilon, epochs_number = pickle.load(file)
-
-    print((f'Loaded existing model with epsilon: {epsilon:.5f},'
-           f' memory slots: {len(dqn.memory)}, epochs: {epochs_number}'))
-else:
-    model = brain.create_model()
-    print('Created new model')
-
-
-def reset_states():
-    """ Resets the states.
-    
-    Takes a random state as current and as a next state.
-    """
-    
-    batch_size = 1
-    state = np.zeros((batch_size, HEIGHT, WIDTH, LAST_STATES_NUMBER))
-    
-    for i in range(LAST_STATES_NUMBER):
-        state[0, :, :, i] = env.board  # Takes 4 last frames
-    
-    return state, state
-
-
-# Game loop
-while True:
-    epochs_number += 1
-    env.reset()
-    current_state, next_state = reset_states()
-    
-    game_over = False
-    steps = 0
-    while not game_over:
-        steps += 1
-        
-        # Select action
-        if np.random.rand() <= epsilon:
-            # Exploration
-            action = np.random.randint(0, 4)
-        else:
-            # Exploitation
-            q_values = model.predict(current_state, verbose=0)[0]  # First action
-            action = int(np.argmax(q_values))
-
-        # Update the environment
-        frame, reward, game_over = env.step(action)
-        
-        frame = np.reshape(frame, (1, HEIGHT, WIDTH, 1))
-        # axis=3 is a number of frames. Here we add new frame to the
-        # next state
-        next_state = np.append(next_state, frame, axis=3)
-        
-        # Previous state should be removed, the oldest one
-        next_state = np.delete(next_state, 0, axis=3)
-        
-        dqn.remember([current_state, action, reward, next_state], game_over)
-        inputs, targets = dqn.get_batch(model, BATCH_SIZE)
-        
-        model.train_on_batch(inputs, targets)
-        
-        current_state = next_state
-                
-    # Update epsilon and save the model
-    epsilon -= EPSILON_DECAY
-    epsilon = max(epsilon, EPSILON_MIN)
-        
-    model.save(MODEL_FILE_PATH)
-    with open(MEMORY_FILE_PATH_TEMP, 'wb') as file:
-        # First writes into the temp file to prevent corruption of the
-        # original file
-        pickle.dump([dqn.memory, epsilon, epochs_number], file)
-    os.replace(MEMORY_FILE_PATH_TEMP, MEMORY_FILE_PATH)
-    
-    print((
-        f'Epoch {epochs_number} - current score: {reward},'
-        f' epsilon: {epsilon:.5f}, memory slots: {len(dqn.memory)}, steps: {steps}'
-    ))
-        
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import os
+import pickle
+import time
+
+from main.game_manager import GameManager
+from model.actor_learner import ActorPool
+from model.batch_prefetcher import BatchPrefetcher
+from model.checkpointer import Checkpointer
+from model.dqn import DQN
+
+
+# Hyper parameters
+LEARNING_RATE = 0.00001
+MAX_MEMORY = 100_000
+GAMMA = 0.9  # More importance to future rewards
+BATCH_SIZE = 16
+PREFETCH_BATCHES = 2  # Batches sampled ahead, while the model trains
+LAST_STATES_NUMBER = 4
+EPSILON_DECAY = 0.0002  # Exploitation
+EPSILON_MIN = 0.05
+PRIORITIZED_MEMORY = False  # Samples experiences by their TD error
+TARGET_UPDATE_INTERVAL = 1000  # Updates between target network syncs
+MIXED_PRECISION = False  # Computes in float16 on supported GPUs
+
+# Actors play the games in their own processes, the learner trains the
+# model in this one
+ACTORS_NUMBER = max(1, (os.cpu_count() or 2) - 1)
+GAMES_PER_ACTOR = 4  # Games of an actor share one forward pass
+PUBLISH_INTERVAL = 100  # Updates between weights publications to actors
+SAVE_INTERVAL = 100  # Epochs between checkpoints
+CHECKPOINTS_NUMBER = 3  # Last checkpoints that are kept
+
+MODEL_FILE_PATH = 'model.keras'
+WEIGHTS_FILE_PATH = 'model.npz'  # Exported for playing without TensorFlow
+MEMORY_DIR_PATH = 'model_memory_store'
+PROGRESS_FILE_PATH = 'model_progress'
+CHECKPOINT_DIR_PATH = 'checkpoints'
+
+
+def main():
+    from model.brain import Brain  # Loads TensorFlow
+
+    env = GameManager()
+    input_shape = (env.board_height, env.board_width, LAST_STATES_NUMBER)
+
+    brain = Brain(input_shape, LEARNING_RATE, MIXED_PRECISION)
+    dqn = DQN(MAX_MEMORY, GAMMA, LAST_STATES_NUMBER, MEMORY_DIR_PATH,
+              PRIORITIZED_MEMORY)
+    epsilon = 1.0  # Exploration - default: 1.0
+    epochs_number = 0
+
+    # Loads existing model or create a new one.
+    if os.path.isfile(MODEL_FILE_PATH):
+        model = brain.load_model(MODEL_FILE_PATH)
+        if os.path.isfile(PROGRESS_FILE_PATH):
+            with open(PROGRESS_FILE_PATH, 'rb') as file:
+                epsilon, epochs_number = pickle.load(file)
+
+        print((f'Loaded existing model with epsilon: {epsilon:.5f},'
+               f' memory slots: {len(dqn.memory)}, epochs: {epochs_number}'))
+    else:
+        model = brain.create_model()
+        print('Created new model')
+
+    dqn.set_target_model(brain.create_target_model(model), TARGET_UPDATE_INTERVAL)
+
+    # Checkpoints are saved in the background, while the training goes on
+    checkpointer = Checkpointer(brain.create_checkpoint_model(model), MODEL_FILE_PATH,
+                                WEIGHTS_FILE_PATH, PROGRESS_FILE_PATH, CHECKPOINT_DIR_PATH,
+                                SAVE_INTERVAL, keep=CHECKPOINTS_NUMBER)
+
+    # Next batches are sampled in the background, while the model trains
+    prefetcher = BatchPrefetcher(dqn, BATCH_SIZE, PREFETCH_BATCHES)
+
+    actors = ActorPool(ACTORS_NUMBER, GAMES_PER_ACTOR, input_shape, epsilon)
+    actors.start(model)
+    print(f'Started {ACTORS_NUMBER} actors, {GAMES_PER_ACTOR} games each')
+
+    updates = 0
+    saved_epochs_number = epochs_number
+    start_time = time.perf_counter()
+    try:
+        while True:
+            scores = actors.drain(dqn)
+            if scores:
+                # Update epsilon per finished game
+                epochs_number += len(scores)
+                epsilon = max(epsilon - EPSILON_DECAY * len(scores), EPSILON_MIN)
+                actors.set_epsilon(epsilon)
+
+            if len(dqn.memory) == 0:
+                time.sleep(0.01)  # Waits for the first transitions
+                continue
+
+            inputs, targets, weights = prefetcher.get_batch(model)
+            model.train_on_batch(inputs, targets, sample_weight=weights)
+
+            updates += 1
+            if updates % PUBLISH_INTERVAL == 0:
+                actors.publish(model)
+
+            if checkpointer.save_if_due(model, dqn, epsilon, epochs_number):
+                elapsed_time = time.perf_counter() - start_time
+                print((
+                    f'Epoch {epochs_number} - last score: {scores[-1]},'
+                    f' epsilon: {epsilon:.5f}, memory slots: {len(dqn.memory)},'
+                    f' updates: {updates}, games/s: '
+                    f'{(epochs_number - saved_epochs_number) / elapsed_time:.1f}'
+                ))
+                saved_epochs_number = epochs_number
+                start_time = time.perf_counter()
+    finally:
+        actors.stop()
+        prefetcher.close()
+        checkpointer.wait()
+
+
+if __name__ == '__main__':
+    main()